@@ -23,7 +23,7 @@ setup(name='yahoo_fantasy_bot',
           'License :: OSI Approved :: MIT License',
           'Programming Language :: Python :: 3.5',
       ],
-      install_requires=['yahoo_fantasy_api>=2.0.1', 'baseball_scraper>=0.4.9',
+      install_requires=['yahoo_fantasy_api>=2.0.1,<2.1', 'baseball_scraper>=0.4.9',
                         'docopt', 'yahoo_oauth', 'nhl_scraper>=0.0.3',
                         'baseball_id>=0.0.6', 'progressbar', 'jinja2'],
       python_requires='>=3',
@@ -1,6 +1,21 @@
 #!/bin/python
 
-from yahoo_fantasy_bot import bot
+from yahoo_fantasy_bot import cache_files, import_timer
+import concurrent.futures
+import configparser
+import datetime
+import glob
+import logging
+import os
+import threading
+import time
+
+
+# Seconds that a Yahoo! OAuth token is valid for
+TOKEN_LIFE = 3600
+
+# Seconds that a token must still be valid for when a league starts to run
+SESSION_MIN_LIFE = 1800
 
 
 class Driver(object):
@@ -12,33 +27,280 @@ class Driver(object):
     :param full: True if we are to optimize using the free agents.  False means
         we just optimize for our bench.
     :param reset_cache: True if the cache files should be removed before running
+    :param sc: OAuth session to use.  If None, one is created for the bot.
+    :param log_progress: True to write the progress of the run to the log
+        rather than to stdout.  This is used when many leagues are run at the
+        same time.
+    :param shared: In-memory caches shared by the leagues of the process.
+        See utils.SportCaches.
     """
-    def __init__(self, cfg, dry_run, full, prompt, reset_cache):
-        self.bot = bot.ManagerBot(cfg, reset_cache)
+    def __init__(self, cfg, dry_run, full, prompt, reset_cache, sc=None,
+                 log_progress=False, shared=None):
+        # The bot pulls in pandas and the Yahoo! libraries, so it is only
+        # imported once there is a team to manage.
+        bot = import_timer.import_module('yahoo_fantasy_bot.bot')
+        self.bot = bot.ManagerBot(cfg, reset_cache, sc, shared)
         self.dry_run = dry_run
         self.full = full
         self.prompt = prompt
+        self.log_progress = log_progress
+        self.logger = logging.getLogger()
+
+    def progress(self, msg):
+        if self.log_progress:
+            self.logger.info("{}: {}".format(self.bot.lg.league_id, msg))
+        else:
+            print(msg)
 
     def run(self):
-        print("Evaluating trades")
-        self.bot.evaluate_trades(dry_run=self.dry_run, verbose=True,
+        self.progress("Evaluating trades")
+        self.bot.evaluate_trades(dry_run=self.dry_run,
+                                 verbose=not self.log_progress,
                                  prompt=self.prompt)
-        print("Adjusting lineup for player status")
+        self.progress("Adjusting lineup for player status")
         self.bot.pick_injury_reserve()
         self.bot.move_non_available_players()
         self.bot.move_recovered_il_to_bench()
         if self.full:
-            print("Optimizing full lineup using available free agents")
+            self.progress(
+                "Optimizing full lineup using available free agents")
             self.bot.optimize_lineup_from_free_agents()
             self.bot.pick_bench()
         else:
-            print("Optimizing open lineup spots using available free agents")
+            self.progress(
+                "Optimizing open lineup spots using available free agents")
             self.bot.fill_empty_spots_from_bench()
             self.bot.fill_empty_spots()
-            print("Optimizing lineup using players available from bench")
+            self.progress(
+                "Optimizing lineup using players available from bench")
             self.bot.pick_bench()
             self.bot.optimize_lineup_from_bench()
-        print("Optimized lineup")
-        self.bot.print_roster()
-        print("Computing roster moves to apply")
+        if not self.log_progress:
+            print("Optimized lineup")
+            self.bot.print_roster()
+        self.progress("Computing roster moves to apply")
         self.bot.apply_roster_moves(dry_run=self.dry_run, prompt=self.prompt)
+        self.bot.save_predictions()
+        self.bot.wait_for_refreshes()
+        self.bot.report_cache_stats()
+
+
+class Daemon(object):
+    """
+    Manage the teams of many leagues from one long running process.
+
+    Each .ini file in the config directory is the config of one league.  A
+    league is run at the times listed in the runAt setting of its [Daemon]
+    section (e.g. "08:00, 17:30"), or every interval minutes if it doesn't have
+    one.  The leagues that are due are run on a pool of worker threads.  The
+    configs are read again before each round, so leagues can be added or
+    removed while the daemon is running.
+
+    The leagues share the process: the libraries are only imported once, the
+    OAuth session of an oauthFile is shared by all of the leagues that use
+    it, and leagues of the same sport share the projections, schedules and
+    scraped data that are held in memory (see utils.SportCaches).  The
+    league caches on disk keep the prediction builders and schedules from
+    one run to the next.
+
+    A league whose config can't be read, or whose runAt times are invalid,
+    is logged and skipped without stopping the other leagues.
+
+    :param cfg_dir: Directory with the config files of the leagues
+    :param dry_run: True if no writes to the Yahoo APIs
+    :param full: True if we are to optimize using the free agents
+    :param interval: Minutes between runs of a league without runAt times
+    :param workers: Most leagues to run at the same time
+    """
+    def __init__(self, cfg_dir, dry_run, full, interval=60, workers=4):
+        self.logger = logging.getLogger()
+        self.cfg_dir = cfg_dir
+        self.dry_run = dry_run
+        self.full = full
+        self.interval = datetime.timedelta(minutes=interval)
+        self.workers = workers
+        self.sessions = {}
+        self.shared = None
+        self.next_runs = {}
+
+    def load_configs(self):
+        """Read the config of each league
+
+        A config that can't be read is logged and left out.
+
+        :return: Config of each league keyed by its file name
+        :rtype: dict
+        """
+        cfgs = {}
+        for fn in sorted(glob.glob(os.path.join(self.cfg_dir, "*.ini"))):
+            try:
+                cfgs[fn] = read_config(fn)
+            except Exception:
+                self.logger.exception("Skipping league {}.  Its config "
+                                      "can't be read".format(fn))
+        return cfgs
+
+    def shared_caches(self):
+        """Return the in-memory caches that the leagues share
+
+        :rtype: utils.SportCaches
+        """
+        if self.shared is None:
+            utils = import_timer.import_module('yahoo_fantasy_bot.utils')
+            self.shared = utils.SportCaches()
+        return self.shared
+
+    def session(self, cfg):
+        """Return an OAuth session for a league that lasts for a whole run
+
+        This is only called from the daemon's own thread, right before the
+        league is run.  The worker threads never refresh a token.  Once the
+        token of a session is past SESSION_MIN_LIFE, a new session is made
+        rather than refreshing the old one in place, because the leagues
+        that are still running use the old one.
+
+        :param cfg: Config of the league
+        :rtype: yahoo_oauth.OAuth2
+        """
+        oauth_file = cfg['Connection']['oauthFile']
+        sc = self.sessions.get(oauth_file)
+        if sc is None or not self._token_lasts(sc):
+            yahoo_oauth = import_timer.import_module('yahoo_oauth')
+            sc = yahoo_oauth.OAuth2(None, None, from_file=oauth_file)
+            if not self._token_lasts(sc):
+                sc.refresh_access_token()
+                # The refresh doesn't update the session
+                sc.session = sc.oauth.get_session(token=sc.access_token)
+            self.sessions[oauth_file] = sc
+        return sc
+
+    def _token_lasts(self, sc):
+        """Check if a session's token is good for at least a run"""
+        return time.time() - sc.token_time < \
+            TOKEN_LIFE - SESSION_MIN_LIFE
+
+    def next_run(self, cfg, now):
+        """Return the next time a league is due to run
+
+        :param cfg: Config of the league
+        :param now: Time to find the next run after
+        :type now: datetime.datetime
+        :rtype: datetime.datetime
+        """
+        if 'Daemon' not in cfg or 'runAt' not in cfg['Daemon']:
+            return now + self.interval
+        runs = []
+        for t in cfg['Daemon']['runAt'].split(','):
+            t = datetime.datetime.strptime(t.strip(), "%H:%M").time()
+            for days in [0, 1]:
+                runs.append(datetime.datetime.combine(
+                    now.date() + datetime.timedelta(days=days), t))
+        return min(run for run in runs if run > now)
+
+    def _next_run_of(self, fn, cfg, now):
+        """Same as next_run() but logs a failure and returns None"""
+        try:
+            return self.next_run(cfg, now)
+        except Exception:
+            self.logger.exception("Skipping league {}.  Its runAt times are "
+                                  "invalid".format(fn))
+            return None
+
+    def run_league(self, fn, cfg, sc):
+        """Run the bot for one league
+
+        A failure is logged so that it doesn't stop the other leagues.
+
+        :param sc: OAuth session to run with.  See session().
+        """
+        self.logger.info("Running league {}".format(fn))
+        try:
+            Driver(cfg, self.dry_run, self.full, False, False, sc,
+                   log_progress=True, shared=self.shared).run()
+        except Exception:
+            self.logger.exception("Run of league {} failed".format(fn))
+
+    def run_due(self, now):
+        """Run all of the leagues that are due
+
+        A new league with runAt times waits for the first of them.  Any other
+        new league is run right away.  A league whose runAt times are
+        invalid isn't run, and is checked again on the next round.
+
+        :param now: Current time
+        :type now: datetime.datetime
+        :return: File names of the leagues that were run
+        :rtype: list(str)
+        """
+        cfgs = self.load_configs()
+        self.next_runs = {fn: self.next_runs.get(fn) for fn in cfgs}
+        for fn, cfg in cfgs.items():
+            if self.next_runs[fn] is None:
+                self.next_runs[fn] = now
+                if 'Daemon' in cfg and 'runAt' in cfg['Daemon']:
+                    self.next_runs[fn] = self._next_run_of(fn, cfg, now)
+        due = [fn for fn, when in self.next_runs.items()
+               if when is not None and when <= now]
+        self.shared_caches()
+        # A league is only handed to the pool once a worker is free, so that
+        # its session is fetched right before it runs
+        free_workers = threading.Semaphore(self.workers)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers) as pool:
+            for fn in due:
+                free_workers.acquire()
+                try:
+                    sc = self.session(cfgs[fn])
+                except Exception:
+                    self.logger.exception("Skipping league {}.  Its OAuth "
+                                          "session can't be made".format(fn))
+                    free_workers.release()
+                    continue
+                future = pool.submit(self.run_league, fn, cfgs[fn], sc)
+                future.add_done_callback(lambda f: free_workers.release())
+        for fn in due:
+            self.next_runs[fn] = self._next_run_of(fn, cfgs[fn],
+                                                   datetime.datetime.now())
+        return due
+
+    def run(self):
+        """Run the leagues as they become due.  This never returns."""
+        while True:
+            self.run_due(datetime.datetime.now())
+            wake = min((when for when in self.next_runs.values()
+                        if when is not None),
+                       default=datetime.datetime.now() + self.interval)
+            secs = (wake - datetime.datetime.now()).total_seconds()
+            self.logger.info("Sleeping until {}".format(wake))
+            time.sleep(max(secs, 1))
+
+
+def read_config(cfg_file):
+    """Read in a config file
+
+    :param cfg_file: Name of the config file
+    :return: The loaded config
+    :rtype: configparser.RawConfigParser
+    """
+    if not os.path.exists(cfg_file):
+        raise RuntimeError("Config file does not exist: " + cfg_file)
+    cfg = configparser.RawConfigParser(
+        converters={'list': lambda x: [i.strip() for i in x.split(',')]}
+    )
+    cfg.read(cfg_file)
+    return cfg
+
+
+def print_cache_report(cfg):
+    """Print the size and age of each of the cache files
+
+    :param cfg: ConfigParser read in
+    """
+    rows = cache_files.report(cfg['Cache']['dir'])
+    print("{:60} {:>12} {:>10}".format("File", "Bytes", "Age (h)"))
+    total = 0
+    for row in rows:
+        print("{:60} {:>12} {:>10.1f}".format(row['file'], row['bytes'],
+                                             row['age_secs'] / 3600))
+        total += row['bytes']
+    print("{:60} {:>12}".format("Total", total))
@@ -2,15 +2,13 @@
 
 from yahoo_oauth import OAuth2
 import yahoo_fantasy_api as yfa
-from yahoo_fantasy_bot import roster, utils
+from yahoo_fantasy_bot import roster, utils, free_agents, import_timer
 import logging
-import pickle
 import os
 import math
 import datetime
 import pandas as pd
 import numpy as np
-import importlib
 import copy
 import collections
 
@@ -26,7 +24,8 @@ class ScoreComparer:
     :param cfg: Configparser object
     :param scorer: Object that computes scores for the categories
     :param lg_lineups: All of the lineups in the league.  This is used to
-        compute a standard deviation of all of the stat categories.
+        compute a standard deviation of all of the stat categories.  It can be
+        a LeagueSummary or a list of lineups.
     """
     def __init__(self, cfg, scorer, lg_lineups):
         self.cfg = cfg
@@ -79,6 +78,8 @@ class ScoreComparer:
         :return: Aggregation compuation for each category
         :rtype: DataFrame
         """
+        if isinstance(lineups, LeagueSummary):
+            return lineups.to_frame().agg([agg])
         scores = pd.DataFrame()
         for lineup in lineups:
             if type(lineup) is pd.DataFrame:
@@ -92,44 +93,226 @@ class ScoreComparer:
         return scores.agg([agg])
 
 
+class LeagueSummary:
+    """Stat category totals of each team's lineup in the league
+
+    This is a compact version of the league lineups.  It has a row for each
+    team and a column for each stat category.
+
+    :param team_keys: Keys of the teams, one for each row
+    :type team_keys: list(str)
+    :param categories: Stat categories, one for each column
+    :type categories: list(str)
+    :param values: Category totals of each team.  Teams with an empty lineup
+        have a row of NaN.
+    :type values: numpy.ndarray
+    :param rosters: Fingerprint of each team's roster
+    :type rosters: list(str)
+    :param lineups: Full prediction frames of each team.  These are only
+        kept for debugging.
+    :type lineups: list(DataFrame)
+    """
+    def __init__(self, team_keys, categories, values, rosters,
+                 lineups=None):
+        self.team_keys = team_keys
+        self.categories = categories
+        self.values = values
+        self.rosters = rosters
+        self.lineups = lineups
+
+    @classmethod
+    def from_lineups(cls, scorer, lineups, keep_lineups=False):
+        """Summarize the lineups of each team
+
+        :param scorer: Object that computes scores for the categories
+        :param lineups: Predicted lineup of each team, keyed by team key
+        :type lineups: dict(str, DataFrame)
+        :param keep_lineups: True if the full lineups are kept too
+        :type keep_lineups: bool
+        :rtype: LeagueSummary
+        """
+        sums = {}
+        rosters = []
+        for tm_key, df in lineups.items():
+            # Lineup could be empty if all players were moved to the bench
+            if len(df.index) > 0:
+                sums[tm_key] = dict(scorer.summarize(df))
+                rosters.append(utils.roster_fingerprint(df['player_id']))
+            else:
+                sums[tm_key] = {}
+                rosters.append(utils.roster_fingerprint([]))
+        df = pd.DataFrame.from_dict(sums, orient='index').reindex(
+            list(lineups.keys())).astype(float)
+        return cls(list(lineups.keys()), df.columns.to_list(),
+                   df.to_numpy(), rosters,
+                   list(lineups.values()) if keep_lineups else None)
+
+    def to_frame(self):
+        return pd.DataFrame(self.values, index=self.team_keys,
+                            columns=self.categories)
+
+
 class ManagerBot:
     """A class that encapsulates an automated Yahoo! fantasy manager.
 
     :param cfg: Config file
     :param reset_cache: Set to True, if the cache files need to be removed first
+    :param sc: OAuth session to use.  If None, a session is created from the
+        oauthFile in the config.
+    :type sc: yahoo_oauth.OAuth2
+    :param shared: In-memory caches shared with the other leagues run by the
+        process.  If None, nothing is shared.
+    :type shared: utils.SportCaches
     """
-    def __init__(self, cfg, reset_cache):
+    def __init__(self, cfg, reset_cache, sc=None, shared=None):
         self.logger = logging.getLogger()
         self.cfg = cfg
-        self.sc = OAuth2(None, None, from_file=cfg['Connection']['oauthFile'])
+        self.shared = shared
+        if sc is None:
+            sc = OAuth2(None, None, from_file=cfg['Connection']['oauthFile'])
+        self.sc = sc
         self.lg = yfa.League(self.sc, cfg['League']['id'])
         self.tm = self.lg.to_team(self.lg.team_key())
-        self.tm_cache = utils.TeamCache(self.cfg, self.lg.team_key())
-        self.lg_cache = utils.LeagueCache(self.cfg)
+        # Each bot keeps the stats of its own run
+        self.cache_stats = utils.CacheStats()
+        self.tm_cache = utils.TeamCache(self.cfg, self.lg.team_key(),
+                                        self.cache_stats)
+        self.lg_cache = utils.LeagueCache(self.cfg, self.cache_stats)
         if reset_cache:
             self.tm_cache.remove()
-            self.lg_cache.remove()
+            self.lg_cache.reset(self.lg.team_key())
+        self.lg_cache.register_team(self.lg.team_key())
         self.load_league_statics()
-        self.pred_bldr = None
+        self.fa_stream = None
         self.my_team_bldr = self._construct_roster_builder()
-        self.ppool = None
         Scorer = self._get_scorer_class()
         self.scorer = Scorer(self.cfg)
         Display = self._get_display_class()
         self.display = Display(self.cfg)
-        self.lineup = None
-        self.bench = []
-        self.injury_reserve = []
         self.opp_sum = None
         self.opp_team_name = None
 
-        self.init_prediction_builder()
-        self.score_comparer = ScoreComparer(self.cfg, self.scorer,
-                                            self.fetch_league_lineups())
-        self.fetch_player_pool()
-        self.sync_lineup()
-        self.pick_injury_reserve()
-        self._auto_pick_opponent()
+        # The expensive state is built the first time it is used.  See the
+        # properties below.
+        self._pred_bldr = None
+        self._score_comparer = None
+        self._ppool = None
+        self._lineup = None
+        self._bench = []
+        self._injury_reserve = []
+        self._sport = None
+
+    @property
+    def pred_bldr(self):
+        """The prediction builder
+
+        It is loaded the first time it is used.
+        """
+        if self._pred_bldr is None:
+            self.init_prediction_builder()
+        return self._pred_bldr
+
+    @pred_bldr.setter
+    def pred_bldr(self, pred_bldr):
+        self._pred_bldr = pred_bldr
+
+    @property
+    def score_comparer(self):
+        """Compares lineups against our opponent for this week
+
+        It is built the first time it is used, from the predicted lineups of
+        the league and of the opponent.
+        """
+        if self._score_comparer is None:
+            self._score_comparer = ScoreComparer(self.cfg, self.scorer,
+                                                 self.fetch_league_lineups())
+            self._auto_pick_opponent()
+        return self._score_comparer
+
+    @property
+    def ppool(self):
+        """Predictions for the free agents and the players on our roster
+
+        They are fetched and predicted the first time they are used.
+        """
+        if self._ppool is None:
+            self._start_free_agent_stream()
+            self.fetch_player_pool()
+        return self._ppool
+
+    @ppool.setter
+    def ppool(self, ppool):
+        self._ppool = ppool
+
+    @property
+    def lineup(self):
+        """Players in our starting lineup
+
+        The lineup, bench and injury reserve are synced with Yahoo! the first
+        time any of them is used.
+        """
+        if self._lineup is None:
+            self.sync_lineup()
+            self.pick_injury_reserve()
+        return self._lineup
+
+    @lineup.setter
+    def lineup(self, lineup):
+        self._lineup = lineup
+
+    @property
+    def bench(self):
+        self.lineup
+        return self._bench
+
+    @bench.setter
+    def bench(self, bench):
+        self._bench = bench
+
+    @property
+    def injury_reserve(self):
+        self.lineup
+        return self._injury_reserve
+
+    @injury_reserve.setter
+    def injury_reserve(self, injury_reserve):
+        self._injury_reserve = injury_reserve
+
+    def _isolated(self):
+        """Return a copy of the bot for a background cache refresh to use
+
+        The copy has its own OAuth session, league and prediction builder so
+        that the refresh doesn't race with the rest of the run.  Like the bot,
+        its expensive state is built the first time it is used.
+        """
+        bot = copy.copy(self)
+        bot.sc = OAuth2(None, None,
+                        from_file=self.cfg['Connection']['oauthFile'])
+        bot.lg = yfa.League(bot.sc, self.cfg['League']['id'])
+        bot.tm = bot.lg.to_team(self.tm.team_key)
+        bot.fa_stream = None
+        bot._pred_bldr = None
+        bot._score_comparer = None
+        bot._ppool = None
+        bot._lineup = None
+        bot._bench = []
+        bot._injury_reserve = []
+        return bot
+
+    def wait_for_refreshes(self):
+        """Give the background cache refreshes a chance to finish
+
+        The refresh threads are daemons, so any refresh that is still running
+        after the refreshWaitTimeout config parameter (in seconds) is
+        abandoned when the program exits.  Its stale file is refreshed again
+        on the next run.
+        """
+        timeout = self.cfg['Cache'].getfloat('refreshWaitTimeout',
+                                             fallback=300)
+        for cache in [self.lg_cache, self.tm_cache]:
+            if not cache.wait_for_refreshes(timeout):
+                self.logger.warning("Abandoning background cache refreshes "
+                                    "in {}".format(cache.cache_dir))
 
     def pick_bench(self):
         """Pick the bench spots based on the current roster."""
@@ -139,6 +322,7 @@ class ManagerBot:
 
         # We'll pick the bench spots by picking players not in your lineup or
         # IR but have the highest ownership %.
+        self._absorb_free_agent_pages(drain=True)
         lineup_names = [e['name'] for e in self.lineup] + \
             [e['name'] for e in self.injury_reserve]
         top_owners = self.ppool.sort_values(by=["percent_owned"],
@@ -251,15 +435,173 @@ class ManagerBot:
 
     def init_prediction_builder(self):
         """Will load and return the prediction builder"""
-        def loader():
-            module = self._get_prediction_module()
+        def loader(bot):
+            module = bot._get_prediction_module()
             func = getattr(module,
-                           self.cfg['Prediction']['builderClassLoader'])
-            return func(self.lg, self.cfg)
+                           bot.cfg['Prediction']['builderClassLoader'])
+            pred_bldr = func(bot.lg, bot.cfg)
+            # Predict the whole player pool now so that the predictions are
+            # cached along with the builder
+            if hasattr(pred_bldr, 'materialize'):
+                bot.load_schedule(pred_bldr)
+                bot.load_player_teams(pred_bldr)
+                pred_bldr.materialize(**bot.cfg['PredictionNamedArguments'])
+            return pred_bldr
 
         expiry = datetime.timedelta(
             minutes=int(self.cfg['Cache']['predictionBuilderExpiry']))
-        self.pred_bldr = self.tm_cache.load_prediction_builder(expiry, loader)
+        self.pred_bldr = self.lg_cache.load_prediction_builder(
+            expiry, lambda: loader(self),
+            self._stale_grace('predictionBuilder'),
+            self._prediction_fingerprint(),
+            isolated_loader=lambda: loader(self._isolated()))
+        self._share_builder_state(self.pred_bldr)
+        self.load_schedule()
+        self.load_player_teams()
+
+    def _sport_key(self):
+        """Return the key of the state that leagues of a sport can share
+
+        Leagues only share state if they are of the same game and season, and
+        predict the same stats from the same projections.
+        """
+        if self._sport is None:
+            settings = self.lg_statics.settings
+            self._sport = (settings.get('game_code'), settings.get('season'),
+                           self.cfg['Prediction'].get('source'),
+                           self.cfg['League'].get('predictedStatCategories'),
+                           self._prediction_fingerprint())
+        return self._sport
+
+    def _shared(self, name, func, max_age=None):
+        """Return state shared with the other leagues of the same sport
+
+        :param name: Name of the state
+        :param func: Function that produces the state if no league has it yet
+        :param max_age: How long the state can be shared for
+        :type max_age: datetime.timedelta
+        """
+        if self.shared is None:
+            return func()
+        return self.shared.memoize(self._sport_key(), name, func, max_age)
+
+    def _share_builder_state(self, pred_bldr):
+        """Swap in the parts of a prediction builder other leagues loaded
+
+        The builder itself is specific to the league, but the projections
+        read from the csv files and the data it scrapes are the same for all
+        leagues of the sport.  The builder of the first league to load them
+        supplies them to the rest.
+        """
+        if self.shared is None:
+            return
+        if self.cfg['Prediction'].get('source') == 'csv' and \
+                hasattr(pred_bldr, 'ppool'):
+            expiry = datetime.timedelta(
+                minutes=int(self.cfg['Cache']['predictionBuilderExpiry']))
+            pred_bldr.ppool = self._shared('ppool', lambda: pred_bldr.ppool,
+                                           expiry)
+        if hasattr(pred_bldr, 'scrape_cache'):
+            expiry = datetime.timedelta(
+                minutes=self.cfg.getint('Daemon', 'sharedScrapeExpiry',
+                                        fallback=60))
+            pred_bldr.scrape_cache = self._shared(
+                'scrape_cache', lambda: pred_bldr.scrape_cache, expiry)
+
+    def save_predictions(self):
+        """Write the predictions made during the run back to the cache
+
+        Prediction builders that can't predict the whole player pool up
+        front (e.g. with the csv source) add to their predictions as players
+        come up.  Saving them lets the next run, and the other teams of the
+        league, reuse them.  Nothing is done if there are no new predictions.
+        """
+        pred_bldr = self._pred_bldr
+        if not getattr(pred_bldr, 'new_predictions', False):
+            return
+        self.lg_cache.update(
+            self.lg_cache.prediction_builder_file(),
+            lambda cached: cached.merge_predictions(pred_bldr))
+        pred_bldr.new_predictions = False
+
+    def load_schedule(self, pred_bldr=None):
+        """Load the season schedule and hand it to the prediction builder
+
+        The schedule is cached in the league cache separately from the
+        prediction builder, so it is only scraped again when it expires.
+        Nothing is done if the prediction builder doesn't use a schedule.
+
+        :param pred_bldr: Prediction builder to give the schedule to.
+            Defaults to the one in use by the bot.
+        """
+        if pred_bldr is None:
+            pred_bldr = self.pred_bldr
+        if not hasattr(pred_bldr, 'build_schedule'):
+            return
+        expiry = datetime.timedelta(
+            minutes=self.cfg['Cache'].getint('scheduleExpiry',
+                                             fallback=10080))
+        fingerprint = "{}:{}".format(*pred_bldr.schedule_dates)
+
+        def isolated_loader():
+            return self._isolated().pred_bldr.build_schedule()
+
+        def loader():
+            return self.lg_cache.load_schedule(
+                expiry, pred_bldr.build_schedule,
+                self._stale_grace('schedule'), fingerprint, isolated_loader)
+
+        sched = self._shared("schedule.{}".format(fingerprint), loader,
+                             expiry)
+        pred_bldr.set_schedule(sched)
+
+    def load_player_teams(self, pred_bldr=None):
+        """Load the team of each player and hand it to the prediction builder
+
+        The players change teams through trades and call-ups, so this is
+        cached in the league cache with a shorter expiry than the prediction
+        builder.  Nothing is done if the prediction builder doesn't use it.
+
+        :param pred_bldr: Prediction builder to give the player teams to.
+            Defaults to the one in use by the bot.
+        """
+        if pred_bldr is None:
+            pred_bldr = self.pred_bldr
+        if not hasattr(pred_bldr, 'build_player_teams'):
+            return
+        expiry = datetime.timedelta(
+            minutes=self.cfg['Cache'].getint('playerTeamsExpiry',
+                                             fallback=360))
+
+        def isolated_loader():
+            return self._isolated().pred_bldr.build_player_teams()
+
+        def loader():
+            return self.lg_cache.load_player_teams(
+                expiry, pred_bldr.build_player_teams,
+                self._stale_grace('playerTeams'), isolated_loader)
+
+        pred_bldr.set_player_teams(self._shared('player_teams', loader,
+                                                expiry))
+
+    def _prediction_fingerprint(self, extra_sections=[]):
+        """Return the fingerprint of the inputs to the predictions
+
+        The prediction builder and anything derived from it are rebuilt when
+        this changes.  It covers the projection csv files and the config
+        sections that affect the predictions.
+
+        :param extra_sections: Other config sections to include
+        """
+        pred_cfg = self.cfg['Prediction']
+        files = []
+        if pred_cfg.get('source') == 'csv':
+            files = [v for k, v in sorted(pred_cfg.items())
+                     if k.endswith('_csv_file')]
+        return utils.fingerprint(
+            self.cfg, ['Prediction', 'Scorer'] + extra_sections, files,
+            contents=self.cfg['Cache'].getboolean('fingerprintContents',
+                                                  fallback=False))
 
     def fetch_cur_lineup(self):
         """Fetch the current lineup as set in Yahoo!"""
@@ -274,51 +616,222 @@ class ManagerBot:
 
     def fetch_player_pool(self):
         """Build the roster pool of players"""
-        if self.ppool is None:
-            plyr_pool = self.fetch_free_agents() + self.fetch_cur_lineup()
+        if self._ppool is None:
+            if self.fa_stream is not None:
+                # Only the free agent slices that are cached are available
+                # now.  The rest are added to the pool as their pages arrive.
+                # See _absorb_free_agent_pages().
+                cached = [pos for pos in self._free_agent_slices()
+                          if pos not in self.fa_stream.downloader.positions]
+                plyr_pool = self.fetch_free_agents(cached) + \
+                    self.fetch_cur_lineup()
+            else:
+                plyr_pool = self.fetch_free_agents() + self.fetch_cur_lineup()
             self.ppool = self._call_predict(plyr_pool, fail_on_missing=False)
 
-    def fetch_free_agents(self):
-        def loader():
+    def _start_free_agent_stream(self):
+        """Start downloading the free agents in the background
+
+        This only happens if streaming is enabled in the config and some of
+        the free agent cache needs to be rebuilt.  It allows the lineup
+        optimizer to start on the first pages of free agents while the rest
+        are still downloading.
+        """
+        if not self.cfg['LineupOptimizer'].getboolean('streamFreeAgents',
+                                                      fallback=False):
+            return
+        stale = [pos for pos in self._free_agent_slices()
+                 if not self.tm_cache.has_free_agents(pos)]
+        if len(stale) == 0:
+            return
+        print("Streaming free agents from Yahoo!")
+        self.fa_stream = free_agents.Streamer(
+            self._free_agent_downloader(stale))
+        self.fa_stream.start()
+
+    def _absorb_free_agent_pages(self, wait=False, drain=False):
+        """Predict any streamed free agent pages and add them to the pool
+
+        :param wait: Block until at least one page is available
+        :param drain: Block until all of the pages have arrived
+        :return: Predictions for the players added to the pool, or None if no
+            players were added
+        :rtype: DataFrame
+        """
+        # Building the pool starts the free agent stream if it is needed
+        self.ppool
+        if self.fa_stream is None:
+            return None
+        if drain:
+            pages = self.fa_stream.drain()
+        else:
+            pages = self.fa_stream.poll(wait=wait)
+        if self.fa_stream.done():
+            # Save the slices so that the next run uses the cache
+            self.fetch_free_agents()
+            self.fa_stream = None
+
+        # A player eligible at many positions is streamed once per slice.
+        # Only predict the ones that are new to the pool.
+        seen = set(self.ppool['player_id'])
+        plyrs = []
+        for page in pages:
+            for plyr in page:
+                if plyr['player_id'] not in seen:
+                    seen.add(plyr['player_id'])
+                    plyrs.append(plyr)
+        if len(plyrs) == 0:
+            return None
+        df = self._call_predict(plyrs, fail_on_missing=False)
+        if len(df.index) == 0:
+            return None
+        self.ppool = pd.concat([self.ppool, df], sort=False)
+        self.logger.info("Added {} streamed free agents to the player pool".
+                         format(len(df.index)))
+        return df
+
+    def fetch_free_agents(self, positions=None):
+        """Fetch the free agents in the league
+
+        The free agents are split into slices by position.  Each slice is
+        cached on its own, and the slices that need to be refreshed are
+        downloaded concurrently.
+
+        :param positions: Slices to fetch.  Default is all of them.
+        :return: Unique free agents across all of the slices
+        :rtype: list(dict)
+        """
+        if positions is None:
+            positions = self._free_agent_slices()
+        downloaded = {}
+        if self.fa_stream is not None and self.fa_stream.done():
+            downloaded = self.fa_stream.join()
+        stale = [pos for pos in positions if pos not in downloaded and
+                 not self.tm_cache.has_free_agents(pos)]
+        if len(stale) > 0:
             print("Fetching free agents from Yahoo!")
-            self.logger.info("Fetching free agents")
-            fa = self.lg.free_agents(None)
-            self.logger.info(
-                "Free agents fetch complete.  {} players in pool".
-                format(len(fa)))
-            return fa
+            self.logger.info("Fetching free agents for {}".format(stale))
+            downloaded.update(self._free_agent_downloader(stale).run())
+
+        def gen_loader(pos):
+            def loader():
+                # The slice may have expired since we checked it
+                if pos not in downloaded:
+                    downloaded.update(
+                        self._free_agent_downloader([pos]).run())
+                return downloaded[pos]
+            return loader
+
+        def gen_isolated_loader(pos):
+            def loader():
+                downloader = self._isolated()._free_agent_downloader([pos])
+                return downloader.run()[pos]
+            return loader
+
+        slices = {}
+        for pos in positions:
+            slices[pos] = self.tm_cache.load_free_agents(
+                pos, self._free_agent_expiry(pos), gen_loader(pos),
+                self._stale_grace('freeAgent'),
+                isolated_loader=gen_isolated_loader(pos))
+        fa = free_agents.merge_slices(slices)
+        self.logger.info("{} free agents in pool".format(len(fa)))
+        return fa
+
+    def _free_agent_slices(self):
+        """Return the positions that the free agents are split up by"""
+        positions = [pos for pos, detail in self.lg_statics.pos.items()
+                     if 'position_type' in detail]
+        return free_agents.slice_positions(positions)
+
+    def _free_agent_expiry(self, pos):
+        """Return the cache expiry of a free agent slice
+
+        The expiry can be overridden for a single position with a
+        freeAgentExpiry.<pos> config parameter.
+        """
+        cache_cfg = self.cfg['Cache']
+        minutes = cache_cfg.get('freeAgentExpiry.{}'.format(pos),
+                                cache_cfg['freeAgentExpiry'])
+        return datetime.timedelta(minutes=int(minutes))
 
-        expiry = datetime.timedelta(
-            minutes=int(self.cfg['Cache']['freeAgentExpiry']))
-        return self.tm_cache.load_free_agents(expiry, loader)
+    def _stale_grace(self, prefix):
+        """Return how long a stale cache entry can be served for
+
+        While a stale entry is served it is refreshed in the background.  This
+        is set with a <prefix>StaleGrace config parameter in the Cache
+        section.  It defaults to 0, which rebuilds the entry as soon as it
+        expires.
+
+        :param prefix: Prefix of the config parameter
+        :rtype: datetime.timedelta
+        """
+        minutes = self.cfg['Cache'].getint('{}StaleGrace'.format(prefix),
+                                           fallback=0)
+        return datetime.timedelta(minutes=minutes)
+
+    def _free_agent_downloader(self, positions):
+        cache_cfg = self.cfg['Cache']
+        return free_agents.Downloader(
+            self.lg, positions,
+            workers=cache_cfg.getint('freeAgentWorkers', fallback=4),
+            pages_in_flight=cache_cfg.getint('freeAgentPagesInFlight',
+                                             fallback=2))
+
+    def report_cache_stats(self):
+        """Log the hit, miss and timing stats of the cache for this run
+
+        The stats are also written as JSON if the statsFile config parameter
+        is set in the Cache section.
+        """
+        self.cache_stats.log(self.logger)
+        stats_file = self.cfg['Cache'].get('statsFile')
+        if stats_file:
+            self.cache_stats.write_json(stats_file)
 
     def fetch_league_lineups(self):
-        def loader():
-            self.logger.info("Fetching lineups for each team")
-            lineups = []
-            for tm_key in self.lg.teams().keys():
-                tm = self.lg.to_team(tm_key)
-                tm_roster = self._get_roster_for_team(tm)
-                lineups.append(self._call_predict(tm_roster, fail_on_missing=True))
-            self.logger.info("All lineups fetched.")
-            return lineups
-
-        return self.tm_cache.load_league_lineup(datetime.timedelta(days=5),
-                                                loader)
+        """Return the summary of the lineups of each team in the league
+
+        Only the category totals are cached.  The full lineups are cached
+        too if the keepLeagueLineups config parameter is set.
+
+        :rtype: LeagueSummary
+        """
+        def loader(bot):
+            bot.logger.info("Fetching lineups for each team")
+            lineups = {}
+            for tm_key in bot.lg.teams().keys():
+                tm = bot.lg.to_team(tm_key)
+                tm_roster = bot._get_roster_for_team(tm)
+                lineups[tm_key] = bot._call_predict(tm_roster,
+                                                    fail_on_missing=True)
+            bot.logger.info("All lineups fetched.")
+            return LeagueSummary.from_lineups(
+                bot.scorer, lineups,
+                keep_lineups=bot.cfg['Cache'].getboolean(
+                    'keepLeagueLineups', fallback=False))
+
+        expiry = datetime.timedelta(
+            minutes=self.cfg['Cache'].getint('leagueLineupExpiry',
+                                             fallback=7200))
+        return self.lg_cache.load_league_lineup(
+            expiry, lambda: loader(self), self._stale_grace('leagueLineup'),
+            self._prediction_fingerprint(['League']),
+            isolated_loader=lambda: loader(self._isolated()))
 
     def invalidate_free_agents(self, plyrs):
-        if os.path.exists(self.tm_cache.free_agents_cache_file()):
-            with open(self.tm_cache.free_agents_cache_file(), "rb") as f:
-                free_agents = pickle.load(f)
-
-            plyr_ids = [e["player_id"] for e in plyrs]
-            self.logger.info("Removing player IDs from free agent cache".
-                             format(plyr_ids))
-            new_players = [e for e in free_agents["payload"]
-                           if e['player_id'] not in plyr_ids]
-            free_agents['payload'] = new_players
-            with open(self.tm_cache.free_agents_cache_file(), "wb") as f:
-                pickle.dump(free_agents, f)
+        """Remove players from the free agent cache
+
+        The players are recorded in the free agent journal.  The cached slices
+        are left as is and the journal is applied when they are loaded.
+
+        :param plyrs: Players that are no longer free agents
+        """
+        if len(plyrs) == 0:
+            return
+        self.logger.info("Journaling adds of player IDs {} for the free "
+                         "agent cache".format([e['player_id'] for e in plyrs]))
+        self.tm_cache.journal_free_agents(plyrs)
 
     def _sum_opponent(self, opp_team_key):
         # Build up the predicted score of the opponent
@@ -328,9 +841,30 @@ class ManagerBot:
             print("Not a valid team: {}:".format(opp_team_key))
             return(None, None)
 
+        # The roster is cheap to fetch.  Only if it changed, or the inputs to
+        # the predictions changed, do we predict the opponent again.  A
+        # rebuilt prediction builder has new predictions even when its inputs
+        # are the same, so the builder's cache file is part of the
+        # fingerprint too.
+        week = self.lg.current_week() + 1
         tm_roster = self._get_roster_for_team(self.lg.to_team(opp_team_key))
-        opp_df = self._call_predict(tm_roster, fail_on_missing=True)
-        opp_sum = self.scorer.summarize(opp_df)
+        self.pred_bldr
+        fingerprint = "{}:{}:{}:{}".format(
+            week,
+            utils.roster_fingerprint([e['player_id'] for e in tm_roster]),
+            self._prediction_fingerprint(['League']),
+            utils.fingerprint(self.cfg, [],
+                              [self.lg_cache.prediction_builder_file()]))
+
+        def loader():
+            opp_df = self._call_predict(tm_roster, fail_on_missing=True)
+            return self.scorer.summarize(opp_df)
+
+        expiry = datetime.timedelta(
+            minutes=self.cfg['Cache'].getint('opponentSummaryExpiry',
+                                             fallback=1440))
+        opp_sum = self.lg_cache.load_opponent_summary(opp_team_key, expiry,
+                                                      fingerprint, loader)
         return (team_name, opp_sum)
 
     def _set_new_lineup_and_bench(self, new_lineup, frozen_bench):
@@ -430,12 +964,32 @@ class ManagerBot:
         """
         Get a list of players from the pool filtered on common criteria
 
+        Any free agents that are still streaming in are waited on first.
+
         :return: Player pool
         :rtype: DataFrame
         """
-        avail_plyrs = self.ppool[self.ppool['percent_owned'] > 10]
+        self._absorb_free_agent_pages(drain=True)
+        return self._filter_pool(self.ppool)
+
+    def _filter_pool(self, ppool):
+        avail_plyrs = ppool[ppool['percent_owned'] > 10]
         return avail_plyrs[avail_plyrs['status'] == '']
 
+    def _get_streamed_pool(self):
+        """
+        Get the newly streamed free agents filtered on common criteria
+
+        This is used as the pool feed for the lineup optimizer.
+
+        :return: New players for the pool or None if none have arrived
+        :rtype: DataFrame
+        """
+        df = self._absorb_free_agent_pages()
+        if df is None:
+            return None
+        return self._filter_pool(df)
+
     def _get_locked_players_list(self):
         locked_file = self.cfg['LineupOptimizer']['lockPlayerFile']
         if locked_file != "":
@@ -464,9 +1018,22 @@ class ManagerBot:
                 locked_plyrs.append(clone_plyr)
                 self.logger.info("{} is added to locked list ({}% owned)".format(plyr['name'], plyr['percent_owned']))
 
-        best_lineup = optimizer_func(self.cfg, self.score_comparer,
-                                     self.my_team_bldr,
-                                     self._get_filtered_pool(), locked_plyrs)
+        # Building the pool starts the free agent stream if it is needed
+        self.ppool
+        if self.fa_stream is not None:
+            # Start optimizing with the first pages of free agents.  The rest
+            # are fed to the optimizer as they arrive.
+            self._absorb_free_agent_pages(wait=True)
+            best_lineup = optimizer_func(self.cfg, self.score_comparer,
+                                         self.my_team_bldr,
+                                         self._filter_pool(self.ppool),
+                                         locked_plyrs,
+                                         pool_feed=self._get_streamed_pool)
+        else:
+            best_lineup = optimizer_func(self.cfg, self.score_comparer,
+                                         self.my_team_bldr,
+                                         self._get_filtered_pool(),
+                                         locked_plyrs)
         if best_lineup:
             self.lineup = copy.deepcopy(best_lineup.get_roster())
         return best_lineup is not None
@@ -576,18 +1143,18 @@ class ManagerBot:
 
         The details about what prediction builder is taken from the config.
         """
-        return importlib.import_module(
+        return import_timer.import_module(
             self.cfg['Prediction']['builderModule'],
             package=self.cfg['Prediction']['builderPackage'])
 
     def _get_scorer_class(self):
-        module = importlib.import_module(
+        module = import_timer.import_module(
             self.cfg['Scorer']['module'],
             package=self.cfg['Scorer']['package'])
         return getattr(module, self.cfg['Scorer']['class'])
 
     def _get_display_class(self):
-        module = importlib.import_module(
+        module = import_timer.import_module(
             self.cfg['Display']['module'],
             package=self.cfg['Display']['package'])
         return getattr(module, self.cfg['Display']['class'])
@@ -597,7 +1164,7 @@ class ManagerBot:
 
         The config file is used to determine the appropriate function.
         """
-        module = importlib.import_module(
+        module = import_timer.import_module(
             self.cfg['LineupOptimizer']['module'],
             package=self.cfg['LineupOptimizer']['package'])
         return getattr(module, self.cfg['LineupOptimizer']['function'])
@@ -0,0 +1,32 @@
+#!/usr/bin/python
+
+import glob
+import os
+import time
+
+
+def report(cache_dir):
+    """Return the size and age of each file in the cache directory
+
+    :param cache_dir: Top level cache directory
+    :return: A row for each file with its path relative to cache_dir, its size
+        in bytes (including any column directories) and its age in seconds
+    :rtype: list(dict)
+    """
+    rows = []
+    now = time.time()
+    pattern = os.path.join(cache_dir, "**", "*")
+    for fn in sorted(glob.glob(pattern, recursive=True)):
+        if not os.path.isfile(fn) or fn.endswith(".lock") or \
+                ".cols." in fn:
+            continue
+        size = os.path.getsize(fn)
+        for d in glob.glob("{}.cols.*".format(fn)):
+            for col_fn in glob.glob(os.path.join(d, "**", "*"),
+                                    recursive=True):
+                if os.path.isfile(col_fn):
+                    size += os.path.getsize(col_fn)
+        rows.append({"file": os.path.relpath(fn, cache_dir),
+                     "bytes": size,
+                     "age_secs": now - os.path.getmtime(fn)})
+    return rows
@@ -0,0 +1,246 @@
+#!/usr/bin/python
+
+import concurrent.futures
+import logging
+import queue
+import threading
+
+
+logger = logging.getLogger()
+
+PLAYERS_PER_PAGE = 25
+
+# Flex positions that only hold players who are eligible at some other
+# position.  We don't download a slice for these since the free agents in them
+# are already in the other slices.  A flex position is only skipped if the
+# league has all of the positions that cover it.  In baseball, Util is kept
+# since some players (e.g. a DH) are only eligible at Util.
+FLEX_POSITIONS = {'Util': ['C', 'LW', 'RW', 'D'],
+                  'P': ['SP', 'RP'],
+                  'F': ['C', 'LW', 'RW']}
+
+
+def fetch_page(lg, start, position=None):
+    """Fetch a single page of free agents from Yahoo!
+
+    This mirrors yahoo_fantasy_api.League._fetch_players, but hands back each
+    page as it is downloaded rather than the accumulated list.  The public
+    League.free_agents() only returns once every page is in, so this is the
+    one place we reach into the private parts of yahoo_fantasy_api.  The
+    version we depend on is pinned in setup.py for that reason.
+
+    :param lg: Yahoo! league
+    :type lg: yahoo_fantasy_api.league.League
+    :param start: Offset of the first player on the page
+    :type start: int
+    :param position: Optional position to filter the free agents on
+    :type position: str
+    :return: Tuple of the number of players on the page and the active free
+        agents that were on it
+    :rtype: (int, list(dict))
+    """
+    j = lg.yhandler.get_players_raw(lg.league_id, start, 'FA',
+                                    position=position)
+    (num_plyrs_on_pg, fa_on_pg) = lg._players_from_page(j)
+    return (int(num_plyrs_on_pg), fa_on_pg)
+
+
+def slice_positions(positions):
+    """Return the positions to split the free agent download by
+
+    :param positions: Roster positions of the league
+    :type positions: list(str)
+    :return: Positions that each get their own free agent slice
+    :rtype: list(str)
+    """
+    slices = []
+    for pos in positions:
+        if pos in FLEX_POSITIONS and \
+                all(p in positions for p in FLEX_POSITIONS[pos]):
+            continue
+        slices.append(pos)
+    return slices
+
+
+def merge_slices(slices):
+    """Combine the free agent slices into a single list
+
+    A player can be eligible at many positions so will show up in more than
+    one slice.  Duplicates are removed.
+
+    :param slices: Free agents for each position
+    :type slices: dict(str, list(dict))
+    :return: Unique free agents
+    :rtype: list(dict)
+    """
+    seen = set()
+    plyrs = []
+    for fa in slices.values():
+        for plyr in fa:
+            if plyr['player_id'] not in seen:
+                seen.add(plyr['player_id'])
+                plyrs.append(plyr)
+    return plyrs
+
+
+class Downloader:
+    """Downloads the free agents for a set of positions concurrently
+
+    Each position is downloaded as a slice.  The pages within a slice are
+    requested in waves of pages_in_flight at a time; a slice is complete once
+    a page comes back short.
+
+    :param lg: Yahoo! league
+    :type lg: yahoo_fantasy_api.league.League
+    :param positions: Positions to download a slice for
+    :type positions: list(str)
+    :param workers: Number of requests to have outstanding with Yahoo!
+    :type workers: int
+    :param pages_in_flight: Number of pages to request at once for a slice
+    :type pages_in_flight: int
+    """
+    def __init__(self, lg, positions, workers=4, pages_in_flight=2):
+        self.lg = lg
+        self.positions = positions
+        self.workers = workers
+        self.pages_in_flight = pages_in_flight
+
+    def run(self, on_page=None):
+        """Download the free agents
+
+        :param on_page: Optional function called with each page of free
+            agents as it arrives.  It is called from the thread that called
+            run().
+        :return: Free agents for each position
+        :rtype: dict(str, list(dict))
+        """
+        pages = {pos: {} for pos in self.positions}
+        next_start = {pos: 0 for pos in self.positions}
+        complete = set()
+        in_flight = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers) as executor:
+            def submit(pos):
+                start = next_start[pos]
+                next_start[pos] += PLAYERS_PER_PAGE
+                fut = executor.submit(fetch_page, self.lg, start, pos)
+                in_flight[fut] = (pos, start)
+
+            for pos in self.positions:
+                for _ in range(self.pages_in_flight):
+                    submit(pos)
+            while len(in_flight) > 0:
+                done, _ = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in done:
+                    (pos, start) = in_flight.pop(fut)
+                    (num_plyrs_on_pg, fa_on_pg) = fut.result()
+                    pages[pos][start] = (num_plyrs_on_pg, fa_on_pg)
+                    if num_plyrs_on_pg > 0 and on_page is not None:
+                        on_page(fa_on_pg)
+                    if num_plyrs_on_pg < PLAYERS_PER_PAGE:
+                        complete.add(pos)
+                    elif pos not in complete:
+                        submit(pos)
+
+        slices = {}
+        for pos in self.positions:
+            # Pages past a short page are from an overlapping wave and are
+            # empty, but drop them anyway in case the pool changed mid-fetch.
+            slices[pos] = []
+            for start in sorted(pages[pos].keys()):
+                (num_plyrs_on_pg, fa_on_pg) = pages[pos][start]
+                slices[pos] += fa_on_pg
+                if num_plyrs_on_pg < PLAYERS_PER_PAGE:
+                    break
+            logger.info("Downloaded {} free agents for {}".format(
+                len(slices[pos]), pos))
+        return slices
+
+
+class Streamer:
+    """Downloads the free agent pages in a background thread
+
+    Yahoo! returns the free agents ordered by rank, so the first pages that
+    arrive have the players most likely to be picked up.  Consumers can pull
+    the pages as they arrive with poll() while the long tail is still being
+    downloaded.
+
+    :param downloader: Object that does the actual download
+    :type downloader: Downloader
+    """
+    def __init__(self, downloader):
+        self.downloader = downloader
+        self.pages = queue.Queue()
+        self.slices = None
+        self.error = None
+        self.finished = False
+        self.thread = threading.Thread(target=self._run,
+                                       name='free-agent-stream', daemon=True)
+
+    def start(self):
+        logger.info("Starting free agent stream")
+        self.thread.start()
+
+    def done(self):
+        """Return True if all of the pages were downloaded and consumed"""
+        return self.finished
+
+    def poll(self, wait=False):
+        """Return the pages that have arrived since the last call
+
+        :param wait: If True, block until at least one page is available or
+            the download has finished.
+        :type wait: bool
+        :return: List of pages.  Each page is a list of free agents.
+        :rtype: list(list(dict))
+        """
+        pages = []
+        if self.finished:
+            return pages
+        if wait:
+            self._take(self.pages.get(), pages)
+        while not self.finished:
+            try:
+                self._take(self.pages.get_nowait(), pages)
+            except queue.Empty:
+                break
+        return pages
+
+    def drain(self):
+        """Block until all of the pages have arrived
+
+        :return: Pages that were not yet returned by poll()
+        :rtype: list(list(dict))
+        """
+        pages = []
+        while not self.finished:
+            self._take(self.pages.get(), pages)
+        return pages
+
+    def join(self):
+        """Wait for the download to finish and return every free agent
+
+        :return: Free agents for each position
+        :rtype: dict(str, list(dict))
+        """
+        self.drain()
+        return self.slices
+
+    def _take(self, page, pages):
+        if page is None:
+            self.finished = True
+            self.thread.join()
+            if self.error is not None:
+                raise self.error
+            logger.info("Free agent stream complete")
+        else:
+            pages.append(page)
+
+    def _run(self):
+        try:
+            self.slices = self.downloader.run(on_page=self.pages.put)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.pages.put(None)
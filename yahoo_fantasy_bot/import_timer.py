@@ -0,0 +1,50 @@
+#!/usr/bin/python
+
+import collections
+import importlib
+import importlib.util
+import sys
+import time
+
+
+# Seconds it took to import each module loaded through import_module(), in
+# the order they were imported.  A module's time includes any modules it
+# imports in turn.
+import_times = collections.OrderedDict()
+
+
+def import_module(name, package=None):
+    """Import a module and record how long it took
+
+    This is a drop in replacement for importlib.import_module() that is used
+    for the heavy and sport specific modules.  They are only imported once a
+    config actually refers to them.
+
+    :param name: Name of the module
+    :type name: str
+    :param package: Package to resolve a relative name against
+    :type package: str
+    :return: The imported module
+    """
+    key = importlib.util.resolve_name(name, package) \
+        if name.startswith('.') else name
+    if key in sys.modules:
+        return sys.modules[key]
+    start = time.perf_counter()
+    module = importlib.import_module(name, package=package)
+    import_times[key] = time.perf_counter() - start
+    return module
+
+
+def report(out=None):
+    """Print how long each of the timed imports took
+
+    :param out: File to print to.  Defaults to stderr.
+    """
+    if out is None:
+        out = sys.stderr
+    print("{:50} {:>10}".format("Module", "Secs"), file=out)
+    for (name, secs) in import_times.items():
+        print("{:50} {:>10.3f}".format(name, secs), file=out)
+    print("{:50} {:>10.3f}".format("Total", sum(import_times.values())),
+          file=out)
@@ -11,17 +11,18 @@ from yahoo_fantasy_bot import roster
 
 
 def optimize_with_genetic_algorithm(cfg, score_comparer, roster_bldr,
-                                    avail_plyrs, locked_plyrs):
+                                    avail_plyrs, locked_plyrs, pool_feed=None):
     """
     Loader for the GeneticAlgorithm class
 
-    See GeneticAlgorithm.__init__ for parameter type descriptions.
+    See GeneticAlgorithm.__init__ and GeneticAlgorithm.run for parameter type
+    descriptions.
     """
     algo = GeneticAlgorithm(cfg, score_comparer, roster_bldr, avail_plyrs,
                             locked_plyrs)
     generations = int(cfg['LineupOptimizer']['generations']) \
         if 'generations' in cfg['LineupOptimizer'] else 100
-    return algo.run(generations)
+    return algo.run(generations, pool_feed)
 
 
 class GeneticAlgorithm:
@@ -73,12 +74,17 @@ class GeneticAlgorithm:
         self.last_lineup_id = 0
         self.pbar = None
 
-    def run(self, generations):
+    def run(self, generations, pool_feed=None):
         """
         Optimize a lineup by running the genetic algorithm
 
         :param generations: The number of generations to run the algorithm for
         :type generations: int
+        :param pool_feed: Optional function that is called at the start of
+        each generation.  It returns a DataFrame of players to add to the pool
+        of available players, or None if no new players have arrived.  The new
+        players get into lineups through mutation.
+        :type pool_feed: function
         :return: The best lineup we generated.  Or None if no lineup was
         generated
         :rtype: list or None
@@ -95,6 +101,8 @@ class GeneticAlgorithm:
             return None
         for generation in range(generations):
             self._update_progress(generation)
+            if pool_feed is not None:
+                self.extend_player_pool(pool_feed())
             self._mate()
             self._mutate()
         self.logger.info(
@@ -102,6 +110,22 @@ class GeneticAlgorithm:
         print("")   # Go to line after progress bar
         return self._compute_best_lineup()
 
+    def extend_player_pool(self, plyrs):
+        """
+        Add more players to the pool of available players
+
+        :param plyrs: Players to add.  Players already in the pool are ignored.
+        :type plyrs: DataFrame
+        """
+        if plyrs is None or len(plyrs.index) == 0:
+            return
+        col = self.player_id_col
+        plyrs = plyrs[~plyrs[col].isin(self.ppool[col])]
+        self.logger.info("Extending player pool with {} players".format(
+            len(plyrs.index)))
+        self.ppool = pd.concat([self.ppool, plyrs], ignore_index=True,
+                               sort=False)
+
     def _gen_lineup_id(self):
         self.last_lineup_id += 1
         return self.last_lineup_id
@@ -2,15 +2,28 @@
 
 from baseball_scraper import baseball_reference, espn, fangraphs
 from baseball_id import Lookup
-from yahoo_fantasy_bot import utils, source
+from yahoo_fantasy_bot import utils, source, schedule
 import pandas as pd
 import numpy as np
 import datetime
+import io
 import logging
+import uuid
 
 
 logger = logging.getLogger()
 
+# Columns in the ID lookup that have a player name
+NAME_COLUMNS = ['mlb_name', 'bref_name', 'cbs_name', 'espn_name', 'fg_name',
+                'retro_name', 'yahoo_name', 'ottoneu_name', 'rotowire_name']
+
+# Columns of the predictions that come from the roster passed to predict()
+ROSTER_COLUMNS = ['eligible_positions', 'status', 'name', 'position_type',
+                  'percent_owned']
+
+# Number of scraper results kept in memory by each Builder
+SCRAPE_CACHE_SIZE = 128
+
 
 class Builder:
     """Class that constructs prediction datasets for hitters and pitchers.
@@ -32,16 +45,31 @@ class Builder:
     :type tss: baseball_reference.TeamSummaryScraper
     """
     def __init__(self, lg, cfg, csv_details, ts, es, tss):
-        hitters = source.read_csv(csv_details['hitters'])
-        pitchers = source.read_csv(csv_details['pitchers'])
-        self.ppool = pd.concat([hitters, pitchers], sort=True)
+        # Only the columns that are used for predictions are read in
+        cats = Categories(cfg)
+        optional = ['G'] + source.extra_columns(cfg)
+        if 'PredictionNamedArguments' in cfg:
+            optional.append(cfg['PredictionNamedArguments'].get(
+                'scrape_id_system', 'playerid'))
+        hitters = source.read_csv(csv_details['hitters'],
+                                  cats.all_hit_cats + cats.int_hit_cats,
+                                  optional)
+        pitchers = source.read_csv(csv_details['pitchers'],
+                                   cats.all_pit_cats + cats.int_pit_cats,
+                                   optional)
+        # The player pool is stored column by column when the builder is
+        # cached, so that a run only reads in the rows it needs.
+        self.ppool = utils.ColumnFrame(
+            pd.concat([hitters, pitchers], sort=True))
         self.id_lookup = Lookup
+        self.name_index = None
         self.use_weekly_schedule = \
             cfg['Scorer'].getboolean('useWeeklySchedule')
         self.source = cfg['Prediction']['source']
         self.ts = ts
         self.es = es
         self.tss = tss
+        self.scrape_cache = utils.LRUCache(SCRAPE_CACHE_SIZE)
         if lg.settings()['weekly_deadline'] != '1':
             raise RuntimeError("This bot only supports weekly lineups.")
         # In the preseason the edit date will be the next day.  Only once the
@@ -54,20 +82,69 @@ class Builder:
             assert(self.wk_start_date.weekday() == 0)
             self.wk_end_date = self.wk_start_date + datetime.timedelta(days=6)
         self.season_end_date = datetime.date(self.wk_end_date.year, 12, 31)
+        self.schedule_dates = (datetime.date(self.wk_end_date.year, 1, 1),
+                               self.season_end_date)
+        self.schedule = None
+        self.pred_table = None
+        self.pred_table_args = None
+        self.unresolved = set()
+        # Identifies this build of the builder in the cache.  See
+        # merge_predictions().
+        self.build_id = uuid.uuid4().hex
+        self.new_predictions = False
 
     def __getstate__(self):
+        # Like the player pool, the prediction table is stored column by
+        # column in the cache
+        pred_table = self.pred_table
+        if isinstance(pred_table, pd.DataFrame):
+            pred_table = utils.ColumnFrame(pred_table)
         return (self.ppool, self.ts, self.es, self.tss, self.wk_start_date,
                 self.wk_end_date, self.season_end_date,
-                self.use_weekly_schedule, self.source)
+                self.use_weekly_schedule, self.source, pred_table,
+                self.pred_table_args, self.build_id)
 
     def __setstate__(self, state):
         self.id_lookup = Lookup
+        self.name_index = None
+        self.scrape_cache = utils.LRUCache(SCRAPE_CACHE_SIZE)
+        self.schedule = None
         (self.ppool, self.ts, self.es, self.tss, self.wk_start_date,
          self.wk_end_date, self.season_end_date, self.use_weekly_schedule,
-         self.source) = state
+         self.source, self.pred_table, self.pred_table_args,
+         self.build_id) = state
+        self.unresolved = set()
+        self.new_predictions = False
+        self.schedule_dates = (datetime.date(self.wk_end_date.year, 1, 1),
+                               self.season_end_date)
 
     def set_id_lookup(self, lk):
         self.id_lookup = lk
+        self.name_index = None
+
+    def set_schedule(self, sched):
+        self.schedule = sched
+
+    def build_schedule(self):
+        """Build the schedule of every team for the season
+
+        :rtype: schedule.Schedule
+        """
+        (start_date, end_date) = self.schedule_dates
+        year = start_date.year
+        teams = self.scrape_cache.memoize(
+            ('team_summary', year), lambda: self.tss.scrape(year))
+        sched = schedule.Schedule(teams.abbrev.to_list(), start_date,
+                                  end_date)
+        self.ts.set_date_range(start_date, end_date)
+        for team in sched.teams:
+            sched.add_games(team, self.ts.scrape(team)['Date'])
+        return sched
+
+    def _get_schedule(self):
+        if self.schedule is None:
+            self.schedule = self.build_schedule()
+        return self.schedule
 
     def select_players(self, plyrs):
         """Return players from the player pool that match the given Yahoo! IDs
@@ -76,18 +153,63 @@ class Builder:
             Yahoo! ID.  These are all of the players we will return.
         :return: List of players from the player pool
         """
+        for _, plyr in self.select_players_frame(plyrs).iterrows():
+            yield plyr
+
+    def select_players_frame(self, plyrs):
+        """Return the players from the player pool as a single DataFrame
+
+        The pool is indexed by Yahoo! ID or FanGraphs ID the first time it
+        is used, so this is a lookup rather than a scan of the pool.
+
+        :param plyrs: List of dicts that contain the player name and their
+            Yahoo! ID.  These are all of the players we will return.
+        :return: A row for each player, in the same order as plyrs
+        :rtype: DataFrame
+        """
+        roster = pd.DataFrame(plyrs)
+        ids = roster['player_id'].to_list()
         if self.source.startswith("yahoo"):
-            for plyr in plyrs:
-                stats = self.ppool[self.ppool['player_id'] == plyr['player_id']].to_dict('record')[0]
-                dict = {**stats, **plyr}
-                yield pd.Series(dict)
+            parts = [self.ppool.take('player_id', ids)]
         else:
             assert(self.source == 'csv')
-            for plyr in plyrs:
-                meta = self._lookup_plyr(plyr, True).to_dict('record')[0]
-                stats = self.ppool[self.ppool['playerid'] == meta['fg_id']].to_dict('record')[0]
-                dict = {**meta, **stats, **plyr}
-                yield pd.Series(dict)
+            meta = self._lookup_plyrs(plyrs, True).drop_duplicates(
+                'player_id').set_index('player_id').reindex(ids)
+            parts = [meta, self.ppool.take('playerid', meta['fg_id'])]
+        parts.append(roster)
+        # Later parts take precedence when the same column is in many of them
+        df = pd.DataFrame(index=range(len(ids)))
+        for part in parts:
+            part = part.reset_index(drop=True)
+            df = df.drop(columns=[c for c in part.columns if c in df.columns])
+            df = pd.concat([df, part], axis=1)
+        return df
+
+    def materialize(self, scrape_id_system='playerid', team_has='abbrev'):
+        """Predict every player in the player pool up front
+
+        The predictions are kept in the prediction table, which is cached
+        column by column with the builder.  Later calls to predict() only
+        slice the table.  This needs the pool to have Yahoo! IDs, so is only
+        done for the yahoo sources.  Other sources fill the table as players
+        are predicted, and the table is written back to the cache with
+        merge_predictions().
+
+        :param scrape_id_system: See predict()
+        :param team_has: See predict()
+        """
+        if not self.source.startswith("yahoo"):
+            return
+        pool = self.ppool.load(['player_id', 'position_type'])
+        plyrs = [{'player_id': int(pid), 'name': name, 'position_type': pt,
+                  'eligible_positions': [], 'status': ''}
+                 for name, pid, pt in zip(pool.index, pool['player_id'],
+                                          pool['position_type'])
+                 if not np.isnan(pid)]
+        logger.info("Materializing predictions for {} players".format(
+            len(plyrs)))
+        self.predict(plyrs, fail_on_missing=False,
+                     scrape_id_system=scrape_id_system, team_has=team_has)
 
     def predict(self, plyrs, fail_on_missing=True,
                 scrape_id_system='playerid', team_has='abbrev'):
@@ -98,6 +220,10 @@ class Builder:
 
         The returning DataFrame is the prediction of each stat.
 
+        The predictions of each player are kept in a table keyed by their
+        Yahoo! ID, so a player is only predicted once.  The roster details
+        (eligible_positions, status, etc.) are taken from plyrs on each call.
+
         :param plyrs: Roster of players to generate predictions for
         :type plyrs: list
         :param fail_on_missing: True we are to fail if any player in
@@ -114,6 +240,101 @@ class Builder:
         :return: Dataset of predictions
         :rtype: DataFrame
         """
+        table_args = (scrape_id_system, team_has)
+        if self.pred_table is None or self.pred_table_args != table_args:
+            self.pred_table = pd.DataFrame()
+            self.pred_table_args = table_args
+            self.unresolved = set()
+        elif isinstance(self.pred_table, utils.ColumnFrame):
+            self.pred_table = self._dedup_ids(self.pred_table.to_frame())
+
+        active = [e for e in plyrs
+                  if e['position_type'] in ['B', 'P'] and not
+                  ('selected_position' in e and
+                   e['selected_position'] in ['BN', 'IL', 'DL'])]
+        known = set(self.pred_table.index)
+        new = [e for e in active if e['player_id'] not in known and
+               (fail_on_missing or e['player_id'] not in self.unresolved)]
+        if len(new) > 0:
+            df = self._predict_players(new, fail_on_missing, scrape_id_system,
+                                       team_has)
+            df = df.drop(columns=[c for c in ROSTER_COLUMNS
+                                  if c in df.columns])
+            # A player can match more than one row of the pool.  The table
+            # must have one row per player to line up with the roster below.
+            self.pred_table = pd.concat(
+                [self.pred_table, self._dedup_ids(df.set_index('player_id'))],
+                sort=False)
+            self.new_predictions = True
+            known = set(self.pred_table.index)
+            self.unresolved.update(e['player_id'] for e in new
+                                   if e['player_id'] not in known)
+
+        # Hitters come before pitchers, each in the order of plyrs
+        roster_cols = ROSTER_COLUMNS[:-1]
+        if any('percent_owned' in e for e in plyrs):
+            roster_cols = ROSTER_COLUMNS
+        found = [e for pt in ['B', 'P'] for e in active
+                 if e['position_type'] == pt and e['player_id'] in known]
+        roster = pd.DataFrame([{k: e.get(k, np.nan) for k in roster_cols}
+                               for e in found], columns=roster_cols)
+        res = self.pred_table.loc[[e['player_id'] for e in found]]
+        res = res.rename_axis('player_id').reset_index()
+        res = pd.concat([res, roster], axis=1)
+
+        # Add a column that will track the selected position of each player.
+        # It is currently set to NaN since other modules fill that in.
+        res = res.assign(selected_position=np.nan)
+        logger.debug("Scrape cache stats: {}".format(
+            self.scrape_cache.stats()))
+        return res
+
+    def merge_predictions(self, other):
+        """Add the predictions that another copy of the builder made
+
+        This is used at the end of a run to write the predictions made during
+        it back to the cached builder.  Nothing is merged if the cached
+        builder was rebuilt in the meantime or predicts with other arguments.
+
+        :param other: Copy of this builder that made new predictions
+        :type other: Builder
+        :return: This builder
+        :rtype: Builder
+        """
+        if other.build_id != self.build_id or other.pred_table is None:
+            return self
+        theirs = other.pred_table
+        if isinstance(theirs, utils.ColumnFrame):
+            theirs = theirs.to_frame()
+        if self.pred_table is None or \
+                self.pred_table_args != other.pred_table_args:
+            self.pred_table = theirs
+            self.pred_table_args = other.pred_table_args
+            return self
+        mine = self.pred_table
+        if isinstance(mine, utils.ColumnFrame):
+            mine = mine.to_frame()
+        merged = pd.concat([mine, theirs], sort=False)
+        self.pred_table = merged[~merged.index.duplicated()]
+        return self
+
+    @staticmethod
+    def _dedup_ids(df):
+        """Keep the first row of each player ID in a frame indexed by it"""
+        dups = df.index.duplicated()
+        if dups.any():
+            logger.warning("Dropping {} duplicate predictions for player IDs "
+                           "{}".format(dups.sum(),
+                                       df.index[dups].unique().to_list()))
+            df = df[~dups]
+        return df
+
+    def _predict_players(self, plyrs, fail_on_missing, scrape_id_system,
+                         team_has):
+        """Compute the predictions of players that aren't in the table yet
+
+        See predict() for the parameters.
+        """
         res = pd.DataFrame()
         for roster_type in ['B', 'P']:
             lk = self._find_roster(roster_type, plyrs, fail_on_missing)
@@ -124,13 +345,15 @@ class Builder:
             # intersection between the player pool and the players from the
             # roster.
             if self.source.startswith("yahoo"):
-                df = pd.merge(lk, self.ppool, how='inner',
+                pool = self.ppool.where_in(scrape_id_system, lk['yahoo_id'])
+                df = pd.merge(lk, pool, how='inner',
                               left_on=['yahoo_id'],
                               right_on=[scrape_id_system],
                               suffixes=('', '_dup'))
             else:
                 assert(self.source == 'csv')
-                df = pd.merge(lk, self.ppool, how='inner', left_on=['fg_id'],
+                pool = self.ppool.where_in(scrape_id_system, lk['fg_id'])
+                df = pd.merge(lk, pool, how='inner', left_on=['fg_id'],
                               right_on=[scrape_id_system])
 
             team_abbrevs = self._lookup_teams(df.mlb_team.to_list(), team_has)
@@ -151,12 +374,10 @@ class Builder:
                 for hit_stat in ['HR', 'RBI', 'AVG', 'OBP', 'R', 'SB']:
                     df[hit_stat] = np.nan
 
-            res = res.append(df, sort=False)
-
-        # Add a column that will track the selected position of each player.
-        # It is currently set to NaN since other modules fill that in.
-        res = res.assign(selected_position=np.nan)
+            res = pd.concat([res, df], sort=False)
 
+        if len(res.index) == 0:
+            return pd.DataFrame(columns=['player_id'])
         return res
 
     def _lookup_teams(self, teams, team_has):
@@ -167,7 +388,9 @@ class Builder:
 
     def _lookup_teams_by_name(self, teams):
         a = []
-        tl_df = self.tss.scrape(self.wk_start_date.year)
+        year = self.wk_start_date.year
+        tl_df = self.scrape_cache.memoize(
+            ('team_summary', year), lambda: self.tss.scrape(year))
         for team in teams:
             # In case we are given a team list with NaN (i.e. player isn't on
             # any team)
@@ -191,97 +414,114 @@ class Builder:
                 a.append(None)
         return a
 
-    def _lookup_plyr(self, plyr, fail_on_missing):
-        one_lk = self.id_lookup.from_yahoo_ids([plyr['player_id']])
-        # Do a lookup of names if the ID lookup didn't work.  We do two of
-        # them.  The first one is to filter on any name that has a missing
-        # yahoo_id.  This is better then just a plain name lookup because
-        # it has a better chance of being unique.  A missing ID typically
-        # happens for rookies.
-        if len(one_lk.index) == 0:
-            one_lk = self.id_lookup.from_names(
-                [plyr['name']], filter_missing='yahoo_id')
-            # Fallback to a pure-name lookup.  There have been instances
-            # with hitter/pitchers where they have two IDs: one for
-            # pitchers and one for hitters.  The id_lookup only keeps
-            # track of one of those IDs.  We will strip off the '(Batter)'
-            # from their name.
-            if len(one_lk.index) == 0:
-                paren = plyr['name'].find('(')
-                if paren > 0:
-                    name = plyr['name'][0:paren-1].strip()
-                else:
-                    name = plyr['name']
-                    # Get rid of any accents
-                    name = utils.normalized(name)
-                one_lk = self.id_lookup.from_names([name])
+    def _lookup_plyrs(self, plyrs, fail_on_missing):
+        """Lookup the ID details of many players at once
 
+        The players are looked up by their Yahoo! ID in one go.  Only the
+        players whose ID can't be found are looked up by name.
+
+        :param plyrs: Players to lookup.  Each must have a player_id and name.
+        :type plyrs: list(dict)
+        :param fail_on_missing: True to raise an exception if a player can't be
+            found
+        :return: A row for each player that was found, with their Yahoo! ID in
+            the player_id column
+        :rtype: DataFrame
+        """
+        by_id = self.id_lookup.from_yahoo_ids([e['player_id'] for e in plyrs])
+        id_counts = by_id.yahoo_id.value_counts()
+        found = [by_id[by_id.yahoo_id.map(id_counts) == 1]]
+        found[0] = found[0].assign(player_id=found[0].yahoo_id.astype(int))
+
+        # Lookup by name if the ID lookup didn't work.  Players that don't
+        # have a yahoo_id are preferred; a missing ID typically happens for
+        # rookies.  The name index ignores accents and qualifiers like
+        # '(Batter)' for players that have separate hitter/pitcher IDs.
+        misses = [e for e in plyrs if e['player_id'] not in id_counts.index]
+        # An ID that matches more than one row is ambiguous.  These players
+        # fail the lookup below.
+        resolved = [(e, by_id[by_id.yahoo_id == e['player_id']])
+                    for e in plyrs if id_counts.get(e['player_id'], 0) > 1]
+        if len(misses) > 0:
+            name_index = self._get_name_index()
+            lk_df = self.id_lookup.df
+            for plyr in misses:
+                rows = name_index.candidates(plyr['name'])
+                no_id = [r for r in rows if np.isnan(lk_df.at[r, 'yahoo_id'])]
+                if len(no_id) > 0:
+                    rows = no_id
+                resolved.append((plyr, lk_df.loc[rows]))
+
+        for plyr, one_lk in resolved:
             if len(one_lk.index) != 1:
                 if fail_on_missing:
                     raise ValueError("Was not able to lookup player: {}".
                                      format(plyr))
-        return one_lk
-
-    def _find_roster(self, position_type, roster, fail_on_missing=True):
-        lk = None
-        for plyr in roster:
-            if plyr['position_type'] != position_type or \
-                    ('selected_position' in plyr and
-                     plyr['selected_position'] in ['BN', 'IL', 'DL']):
                 continue
+            found.append(one_lk.assign(player_id=plyr['player_id']))
+        return pd.concat(found)
 
-            one_lk = self._lookup_plyr(plyr, fail_on_missing)
-            if len(one_lk.index) != 1:
-                continue
+    def _get_name_index(self):
+        """Return the index of every name in the ID lookup
 
-            ep_series = pd.Series([plyr["eligible_positions"]], dtype="object",
-                                  index=one_lk.index)
-            one_lk = one_lk.assign(eligible_positions=ep_series)
-            yahoo_series = pd.Series([plyr['player_id']], index=one_lk.index)
-            one_lk = one_lk.assign(player_id=yahoo_series)
-            status_series = pd.Series([plyr['status']], index=one_lk.index)
-            one_lk = one_lk.assign(status=status_series)
-            name_series = pd.Series([plyr['name']], index=one_lk.index)
-            one_lk = one_lk.assign(name=name_series)
-            pt_series = pd.Series([plyr['position_type']], index=one_lk.index)
-            one_lk = one_lk.assign(position_type=pt_series)
-            if 'percent_owned' in plyr:
-                pct_series = pd.Series([plyr['percent_owned']],
-                                       index=one_lk.index)
-                one_lk = one_lk.assign(percent_owned=pct_series)
+        It is built the first time it is needed in a run.
+        """
+        if self.name_index is None:
+            df = self.id_lookup.df
+            names = pd.concat([df[c] for c in NAME_COLUMNS if c in df.columns])
+            self.name_index = utils.NameIndex(names.to_list(),
+                                              names.index.to_list())
+        return self.name_index
 
-            if lk is None:
-                lk = one_lk
-            else:
-                lk = lk.append(one_lk)
-        return lk
+    def _find_roster(self, position_type, roster, fail_on_missing=True):
+        plyrs = [e for e in roster
+                 if e['position_type'] == position_type and not
+                 ('selected_position' in e and
+                  e['selected_position'] in ['BN', 'IL', 'DL'])]
+        if len(plyrs) == 0:
+            return None
+        lk = self._lookup_plyrs(plyrs, fail_on_missing)
+        if len(lk.index) == 0:
+            return None
+
+        # Attach the roster details of each player with a single merge
+        meta_cols = ['player_id', 'eligible_positions', 'status', 'name',
+                     'position_type']
+        if any('percent_owned' in e for e in plyrs):
+            meta_cols.append('percent_owned')
+        meta = pd.DataFrame([{k: e.get(k, np.nan) for k in meta_cols}
+                             for e in plyrs], columns=meta_cols)
+        lk = meta.merge(lk.drop(columns=[c for c in meta_cols[1:]
+                                         if c in lk.columns]),
+                        on='player_id', how='inner')
+        return lk[[c for c in lk.columns if c not in meta_cols] + meta_cols]
 
-    def _num_games_for_team(self, abrev, week):
-        if abrev is None:
-            return 0
+    def _num_games_for_teams(self, abrevs, week):
         if week:
-            self.ts.set_date_range(self.wk_start_date, self.wk_end_date)
+            end_date = self.wk_end_date
         else:
-            self.ts.set_date_range(self.wk_start_date, self.season_end_date)
-        df = self.ts.scrape(abrev)
-        return len(df.index)
-
-    def _num_games_for_teams(self, abrevs, week):
-        games = []
-        for abrev in abrevs:
-            games.append(self._num_games_for_team(abrev, week))
-        return games
+            end_date = self.season_end_date
+        return self._get_schedule().games_between_for_teams(
+            abrevs, self.wk_start_date, end_date).tolist()
 
     def _num_gs(self, espn_ids):
+        """Return the number of probable starts for each pitcher
+
+        :param espn_ids: ESPN IDs of the pitchers
+        :return: Number of starts for each ID
+        :rtype: list(int)
+        """
+        starts = self.scrape_cache.memoize(
+            ('probable_starts', self.es.start_date, self.es.end_date),
+            self._count_probable_starts)
+        gs = pd.Series(espn_ids).map(starts).fillna(0).astype(int)
+        return gs.to_list()
+
+    def _count_probable_starts(self):
         df = self.es.scrape()
-        num_GS = []
-        for espn_id in espn_ids:
-            if len(df.index) > 0:
-                gs = len(df[df.espn_id == espn_id].index)
-            else:
-                gs = 0
-            num_GS.append(gs)
-        return num_GS
+        if len(df.index) == 0:
+            return pd.Series(dtype=int)
+        return df.espn_id.value_counts()
 
 
 def init_prediction_builder(lg, cfg):
@@ -313,27 +553,28 @@ def init_prediction_builder(lg, cfg):
 
 
 class GenericCsvScraper:
+    """Scraper that pulls projections out of csv exports (e.g. ZiPS/Steamer)
+
+    The exports have a title row before the header and a footer row, which
+    are trimmed off before the file is parsed.  Each projection file is
+    parsed once and indexed by its MLBAM ID with the Name column filled in.
+
+    :param batter_proj_file: Name of the csv file with batter projections
+    :type batter_proj_file: str
+    :param pitcher_proj_file: Name of the csv file with pitcher projections
+    :type pitcher_proj_file: str
+    """
     def __init__(self, batter_proj_file, pitcher_proj_file):
-        self.batter_cache = pd.read_csv(batter_proj_file,
-                                        encoding='iso-8859-1',
-                                        header=1,
-                                        skipfooter=1,
-                                        engine='python')
-        self.pitcher_cache = pd.read_csv(pitcher_proj_file,
-                                         encoding='iso-8859-1',
-                                         header=1,
-                                         skipfooter=1,
-                                         engine='python')
+        self.batter_cache = self._parse(batter_proj_file,
+                                        fangraphs.ScrapeType.HITTER)
+        self.pitcher_cache = self._parse(pitcher_proj_file,
+                                         fangraphs.ScrapeType.PITCHER)
 
     def scrape(self, mlb_ids, scrape_as):
         """Scrape the csv file and return those match mlb_ids"""
         cache = self._get_cache(scrape_as)
-        df = cache[cache['MLBAM ID'].isin(mlb_ids)]
-        df['Name'] = df['Firstname'] + " " + df['Lastname']
-        df = df.rename(columns={"Tm": "Team"})
-        if scrape_as == fangraphs.ScrapeType.PITCHER:
-            df = df.rename(columns={"Sv": "SV", "Hld": "HLD", "K": "SO"})
-        return df
+        ids = cache.index.intersection(pd.Index(mlb_ids).dropna().unique())
+        return cache.loc[ids].rename_axis(cache.index.name).reset_index()
 
     def _get_cache(self, scrape_as):
         if scrape_as == fangraphs.ScrapeType.HITTER:
@@ -341,6 +582,19 @@ class GenericCsvScraper:
         else:
             return self.pitcher_cache
 
+    def _parse(self, proj_file, scrape_as):
+        with open(proj_file, "rb") as f:
+            raw = f.read()
+        # Drop the footer so that the C parser can be used.  It doesn't
+        # support skipfooter.
+        raw = raw.rstrip(b"\r\n").rpartition(b"\n")[0]
+        df = pd.read_csv(io.BytesIO(raw), encoding='iso-8859-1', header=1)
+        df['Name'] = df['Firstname'] + " " + df['Lastname']
+        df = df.rename(columns={"Tm": "Team"})
+        if scrape_as == fangraphs.ScrapeType.PITCHER:
+            df = df.rename(columns={"Sv": "SV", "Hld": "HLD", "K": "SO"})
+        return df.set_index('MLBAM ID')
+
 
 class Categories:
     def __init__(self, cfg):
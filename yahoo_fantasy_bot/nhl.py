@@ -5,11 +5,64 @@ import numpy as np
 from nhl_scraper import nhl
 import logging
 import datetime
-from yahoo_fantasy_bot import source
+from yahoo_fantasy_bot import source, utils, schedule
 
 
 logger = logging.getLogger()
 
+# Yahoo! abbreviations of the NHL teams that differ from the NHL's own
+YAHOO_TEAM_ABBREVS = {'LA': 'LAK', 'NJ': 'NJD', 'SJ': 'SJS', 'TB': 'TBL',
+                      'WAS': 'WSH', 'MON': 'MTL'}
+
+
+def _month_ranges(start_date, end_date):
+    """Split a range of dates into one range for each month
+
+    :return: First and last day (inclusive) of each range
+    :rtype: list((datetime.date, datetime.date))
+    """
+    ranges = []
+    first = start_date
+    while first <= end_date:
+        next_month = (first.replace(day=1) +
+                      datetime.timedelta(days=32)).replace(day=1)
+        last = min(end_date, next_month - datetime.timedelta(days=1))
+        ranges.append((first, last))
+        first = next_month
+    return ranges
+
+
+class Scraper(nhl.Scraper):
+    """NHL scraper that can also request the games for a range of dates"""
+    def schedule(self, start_date, end_date):
+        """Return the games played between two dates
+
+        :param start_date: First day of the range
+        :type start_date: datetime.date
+        :param end_date: Last day of the range (inclusive)
+        :type end_date: datetime.date
+        :return: Response of the NHL schedule endpoint.  It has the games of
+            each day under 'dates'.
+        :rtype: dict
+        """
+        return self.ea.get("schedule?startDate={}&endDate={}".format(
+            start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
+
+    def players(self):
+        """Return the team of every NHL player
+
+        Unlike the base class, the rosters are requested on each call rather
+        than kept with the scraper, which is cached along with the builder.
+
+        :return: The teamId, playerId and name of each player
+        :rtype: DataFrame
+        """
+        self.players_cache = None
+        try:
+            return super(Scraper, self).players()
+        finally:
+            self.players_cache = None
+
 
 class Builder:
     """Class that constructs prediction datasets for hockey players.
@@ -25,16 +78,160 @@ class Builder:
         predicted stats
     """
     def __init__(self, lg, cfg, csv_details):
-        skaters = source.read_csv(csv_details['skaters'])
-        goalies = source.read_csv(csv_details['goalies'])
-        self.ppool = pd.concat([skaters, goalies], sort=True)
-        self.nhl_scraper = nhl.Scraper()
-        wk_start_date = lg.edit_date()
-        assert(wk_start_date.weekday() == 0)
-        wk_end_date = wk_start_date + datetime.timedelta(days=6)
-        self.team_game_count = self.nhl_scraper.games_count(wk_start_date,
-                                                            wk_end_date)
-        self.nhl_players = self.nhl_scraper.players()
+        # Only the columns that are used for predictions are read in
+        cats = cfg['League'].getlist('predictedStatCategories')
+        skater_cats = [c for c in cats
+                       if PlayerPrinter._get_stat_category(c) == 'S']
+        goalie_cats = [c for c in cats
+                       if PlayerPrinter._get_stat_category(c) == 'G']
+        if 'SV%' in goalie_cats:
+            goalie_cats += ['GA', 'SV']
+        optional = source.extra_columns(cfg)
+        skaters = source.read_csv(csv_details['skaters'], skater_cats,
+                                  optional)
+        goalies = source.read_csv(csv_details['goalies'], goalie_cats,
+                                  optional)
+        # The player pool is stored column by column when the builder is
+        # cached, so that a run only reads in the rows it needs.
+        self.ppool = utils.ColumnFrame(
+            pd.concat([skaters, goalies], sort=True))
+        self.nhl_scraper = Scraper()
+        self.wk_start_date = lg.edit_date()
+        assert(self.wk_start_date.weekday() == 0)
+        self.wk_end_date = self.wk_start_date + datetime.timedelta(days=6)
+        self.schedule_dates = schedule.season_dates(lg, self.wk_start_date,
+                                                    self.wk_end_date)
+        self.schedule = None
+        self.nhl_players = None
+        self.name_indexes = None
+
+    def __getstate__(self):
+        # The schedule and the NHL players are cached on their own and the
+        # name indexes are rebuilt in each run
+        state = self.__dict__.copy()
+        state['schedule'] = None
+        state['nhl_players'] = None
+        state['name_indexes'] = None
+        return state
+
+    def _get_name_indexes(self):
+        """Return the name indexes of the player pool and of the NHL players
+
+        They are built the first time they are needed in a run.
+
+        :return: Index that maps a name to its rows in the player pool, and
+            index that maps a name to the NHL team of the player
+        :rtype: (utils.NameIndex, utils.NameIndex)
+        """
+        if self.name_indexes is None:
+            pool_names = self.ppool.column(self.ppool.index_name)
+            nhl_players = self._get_player_teams()
+            self.name_indexes = (
+                utils.NameIndex(pool_names, range(len(pool_names))),
+                utils.NameIndex(nhl_players['name'], nhl_players['teamId']))
+        return self.name_indexes
+
+    def _pool_row(self, plyr):
+        """Return the row of a player in the player pool
+
+        A name that more than one row has is resolved by the player_id
+        column of the pool, if it has one.
+
+        :param plyr: Player with their name and Yahoo! ID
+        :type plyr: dict
+        :return: Position of the row, or None if it is missing or ambiguous
+        """
+        (pool_index, _) = self._get_name_indexes()
+        rows = pool_index.candidates(plyr['name'])
+        if len(rows) > 1 and 'player_id' in self.ppool.columns:
+            pool_ids = self.ppool.column('player_id')
+            rows = [r for r in rows if pool_ids[r] == plyr['player_id']]
+            if len(rows) == 1:
+                return rows[0]
+        if len(rows) > 1:
+            logger.warning("Skipping {}.  Their name matches {} players in "
+                           "the projections".format(plyr['name'], len(rows)))
+            return None
+        return rows[0] if len(rows) == 1 else None
+
+    def _team_id(self, plyr):
+        """Return the NHL team of a player
+
+        A name that players of more than one team have is resolved by the
+        Yahoo! team abbreviation of the player (editorial_team_abbr), if it
+        is known.
+
+        :param plyr: Player with their name
+        :type plyr: dict
+        :return: NHL team ID, or None if it is missing or ambiguous
+        """
+        (_, team_index) = self._get_name_indexes()
+        team_ids = team_index.candidates(plyr['name'])
+        if len(team_ids) > 1:
+            abbrev = plyr.get('editorial_team_abbr')
+            if type(abbrev) is str:
+                abbrev = abbrev.upper()
+                abbrev = YAHOO_TEAM_ABBREVS.get(abbrev, abbrev)
+                teams = self.nhl_scraper.teams()
+                team_ids = [t for t in team_ids if t in
+                            teams.loc[teams['abbrev'] == abbrev, 'id'].values]
+            if len(team_ids) != 1:
+                logger.warning("Unable to tell which team {} is on.  Their "
+                               "name matches players of more than one team".
+                               format(plyr['name']))
+                return None
+        return team_ids[0] if len(team_ids) == 1 else None
+
+    def set_player_teams(self, nhl_players):
+        self.nhl_players = nhl_players
+        self.name_indexes = None
+
+    def build_player_teams(self):
+        """Scrape the team that each NHL player is on
+
+        The NHL only serves whole team rosters, so the rosters of all of the
+        teams are requested again, in a single request.
+
+        :return: The teamId, playerId and name of each player
+        :rtype: DataFrame
+        """
+        return self.nhl_scraper.players()
+
+    def _get_player_teams(self):
+        if self.nhl_players is None:
+            self.nhl_players = self.build_player_teams()
+        return self.nhl_players
+
+    def set_schedule(self, sched):
+        self.schedule = sched
+
+    def build_schedule(self):
+        """Build the schedule of every team for the season
+
+        The schedule is requested from the NHL one month at a time.
+
+        :rtype: schedule.Schedule
+        """
+        (start_date, end_date) = self.schedule_dates
+        sched = schedule.Schedule(self.nhl_scraper.teams()['id'].to_list(),
+                                  start_date, end_date)
+        games = {}
+        for (first, last) in _month_ranges(start_date, end_date):
+            r = self.nhl_scraper.schedule(first, last)
+            for day in r.get('dates', []):
+                for game in day['games']:
+                    for side in ['away', 'home']:
+                        team_id = game['teams'][side]['team']['id']
+                        games.setdefault(team_id, []).append(day['date'])
+        for (team_id, dates) in games.items():
+            if team_id in sched.team_index:
+                sched.add_games(team_id, dates)
+        return sched
+
+    def _get_schedule(self):
+        if self.schedule is None:
+            self.schedule = self.build_schedule()
+        return self.schedule
 
     def select_players(self, plyrs):
         """Return players from the player pool that match the given Yahoo! IDs
@@ -44,7 +241,7 @@ class Builder:
         :return: List of players from the player pool
         """
         yahoo_ids = [e['player_id'] for e in plyrs]
-        return self.ppool[self.ppool['player_id'].isin(yahoo_ids)]
+        return self.ppool.where_in('player_id', yahoo_ids)
 
     def predict(self, plyrs, fail_on_missing=True, **kwargs):
         """Build a dataset of hockey predictions for the week
@@ -69,38 +266,23 @@ class Builder:
         # two data frames.  This also has the affect of attaching eligible
         # positions and Yahoo! player ID from the input player pool.
         my_roster = pd.DataFrame(plyrs)
-        df = my_roster.join(self.ppool, how='inner', on='name', lsuffix='_dup')
+        rows = [self._pool_row(plyr) for plyr in plyrs]
+        found = [i for (i, row) in enumerate(rows) if row is not None]
+        pool = self.ppool.load(
+            rows=np.array([rows[i] for i in found], dtype=np.int64))
+        pool.index = my_roster.index[found]
+        df = my_roster.iloc[found].join(pool, lsuffix='_dup')
 
         # Then we'll figure out the number of games each player is playing
-        # this week.  To do this, we'll verify the team each player players
-        # for then using the game count added as a column.
-        team_ids = []
-        wk_g = []
-        for plyr_series in df.iterrows():
-            plyr = plyr_series[1]
-            (team_id, g) = self._find_players_schedule(plyr['name'])
-            team_ids.append(team_id)
-            wk_g.append(g)
-        df['team_id'] = team_ids
-        df['WK_G'] = wk_g
+        # this week.  To do this, we'll find the team each player plays for
+        # then look up the game counts of all of the teams at once.
+        team_ids = [self._team_id(plyrs[i]) for i in found]
+        df['team_id'] = [np.nan if t is None else t for t in team_ids]
+        df['WK_G'] = self._get_schedule().games_between_for_teams(
+            team_ids, self.wk_start_date, self.wk_end_date)
 
         return df
 
-    def _find_players_schedule(self, plyr_name):
-        """Find a players schedule for the upcoming week
-
-        :param plyr_name: Name of the player
-        :type plyr_name: str
-        :return: Pair of team_id (from NHL) and the number of games
-        :rtype: (int, int)
-        """
-        df = self.nhl_players[self.nhl_players['name'] == plyr_name]
-        if len(df.index) == 1:
-            team_id = df['teamId'].iloc(0)[0]
-            return (team_id, self.team_game_count[team_id])
-        else:
-            return(np.nan, 0)
-
 
 def init_prediction_builder(lg, cfg):
     if 'source' not in cfg['Prediction']:
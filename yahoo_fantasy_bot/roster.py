@@ -1,12 +1,11 @@
 #!/usr/bin/python
 
 import copy
-import importlib
 import logging
 import numpy as np
 import pandas as pd
 
-from yahoo_fantasy_bot import utils
+from yahoo_fantasy_bot import utils, import_timer
 
 
 class Container:
@@ -135,7 +134,7 @@ class Container:
                 break
 
     def _get_scoreaccumulator_class(self, cfg):
-        module = importlib.import_module(
+        module = import_timer.import_module(
             cfg['ScoreAccumulator']['module'],
             package=cfg['ScoreAccumulator']['package'])
         return getattr(module, cfg['ScoreAccumulator']['class'])
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger()
+
+
+class Schedule:
+    """Number of games each team plays on each day of a season
+
+    The games are kept in a teams x days matrix along with its cumulative sum
+    over the days.  This makes the number of games in any date range a
+    constant time lookup.
+
+    :param teams: Teams in the schedule
+    :type teams: list
+    :param start_date: First day of the schedule
+    :type start_date: datetime.date
+    :param end_date: Last day of the schedule (inclusive)
+    :type end_date: datetime.date
+    """
+    def __init__(self, teams, start_date, end_date):
+        if start_date > end_date:
+            raise RuntimeError("End date must be beyond start")
+        self.teams = list(teams)
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+        self.start_date = start_date
+        self.end_date = end_date
+        num_days = (end_date - start_date).days + 1
+        self.games = np.zeros((len(self.teams), num_days), dtype=np.int32)
+        self.cum_games = None
+
+    def add_games(self, team, dates):
+        """Add games for a team
+
+        Games outside of the schedule's date range are ignored.
+
+        :param team: Team that plays the games
+        :param dates: Date of each game.  A date appears more than once for a
+            double header.
+        :type dates: list(datetime.date)
+        """
+        row = self.team_index[team]
+        for date in pd.to_datetime(pd.Series(dates)).dt.date:
+            day = (date - self.start_date).days
+            if 0 <= day < self.games.shape[1]:
+                self.games[row, day] += 1
+        self.cum_games = None
+
+    def games_between(self, team, start_date, end_date):
+        """Return the number of games a team plays in a date range
+
+        :param team: Team to look up.  A team not in the schedule has no games.
+        :param start_date: Starting date
+        :type start_date: datetime.date
+        :param end_date: Ending date (inclusive)
+        :type end_date: datetime.date
+        :rtype: int
+        """
+        return int(self.games_between_for_teams([team], start_date,
+                                                end_date)[0])
+
+    def games_between_for_teams(self, teams, start_date, end_date):
+        """Return the number of games each team plays in a date range
+
+        :param teams: Teams to look up.  Teams not in the schedule (e.g. None)
+            have no games.
+        :type teams: list
+        :param start_date: Starting date
+        :type start_date: datetime.date
+        :param end_date: Ending date (inclusive)
+        :type end_date: datetime.date
+        :rtype: numpy.ndarray
+        """
+        if self.cum_games is None:
+            self.cum_games = np.zeros(
+                (self.games.shape[0] + 1, self.games.shape[1] + 1),
+                dtype=np.int32)
+            # The extra row is all zeros and is used for unknown teams
+            self.cum_games[:-1, 1:] = np.cumsum(self.games, axis=1)
+        if start_date < self.start_date or end_date > self.end_date:
+            logger.warning("Date range {} to {} is outside of the schedule "
+                           "({} to {})".format(start_date, end_date,
+                                               self.start_date, self.end_date))
+        num_days = self.games.shape[1]
+        st = min(max((start_date - self.start_date).days, 0), num_days)
+        ed = min(max((end_date - self.start_date).days + 1, st), num_days)
+        rows = np.array([self.team_index.get(team, -1) for team in teams],
+                        dtype=np.int64)
+        return self.cum_games[rows, ed] - self.cum_games[rows, st]
+
+    def covers(self, start_date, end_date):
+        """Check if a date range is within the schedule
+
+        :rtype: bool
+        """
+        return self.start_date <= start_date and end_date <= self.end_date
+
+
+def season_dates(lg, start_date, end_date):
+    """Return the first and last day of the league's season
+
+    :param lg: Yahoo! league
+    :type lg: yahoo_fantasy_api.league.League
+    :param start_date: Date to use if the league doesn't have a start date
+    :param end_date: Date to use if the league doesn't have an end date
+    :rtype: (datetime.date, datetime.date)
+    """
+    settings = lg.settings()
+
+    def parse(k, default):
+        if k in settings:
+            return datetime.datetime.strptime(settings[k], "%Y-%m-%d").date()
+        return default
+
+    return (min(parse('start_date', start_date), start_date),
+            max(parse('end_date', end_date), end_date))
@@ -129,20 +129,76 @@ class CSV:
         return details
 
 
-def read_csv(csv_detail):
-    '''Helper to read a csv file based on config settings'''
+# Columns that identify a player.  They are kept whenever a projection file
+# has them.
+ID_COLUMNS = ['player_id', 'playerid', 'name', 'Name', 'position_type']
+
+
+def extra_columns(cfg):
+    """Return the columns of the projections to keep besides the stats
+
+    These are the player ID column and any columns listed in the
+    extraColumns config setting.
+
+    :param cfg: Loaded config object
+    :type cfg: configparser.ConfigParser
+    :rtype: list(str)
+    """
+    pcfg = cfg['Prediction']
+    cols = [c.strip() for c in pcfg.get('extraColumns', '').split(',')
+            if c.strip() != '']
+    if 'player_id_column_name' in pcfg:
+        cols.append(pcfg['player_id_column_name'])
+    return cols
+
+
+def read_csv(csv_detail, stats=None, optional=[]):
+    '''Helper to read a csv file based on config settings
+
+    :param csv_detail: Details about the csv file, as returned by
+        fetch_csv_details()
+    :type csv_detail: dict
+    :param stats: Stat columns that are used from the file.  When given, only
+        these columns, the index column, the ID_COLUMNS and the optional
+        columns are read in.  The stats are read as float32.  Default is to
+        read every column.
+    :type stats: list(str)
+    :param optional: Other columns to read in, if the file has them
+    :type optional: list(str)
+    :return: The projections in the file
+    :rtype: DataFrame
+    '''
     if 'header' in csv_detail:
         header = int(csv_detail['header'])
     else:
         header = None
+    kwargs = {}
     if 'column_names' in csv_detail:
-        return pd.read_csv(csv_detail['file_name'],
-                           index_col=csv_detail['index_col'],
-                           names=csv_detail['column_names'],
-                           header=header,
-                           na_values='-')
-    else:
-        return pd.read_csv(csv_detail['file_name'],
-                           index_col=csv_detail['index_col'],
-                           header=header,
-                           na_values='-')
+        kwargs['names'] = csv_detail['column_names']
+    if stats is not None:
+        kwargs.update(_read_csv_columns(csv_detail, header, kwargs, stats,
+                                        optional))
+    return pd.read_csv(csv_detail['file_name'],
+                       index_col=csv_detail['index_col'],
+                       header=header,
+                       na_values='-',
+                       **kwargs)
+
+
+def _read_csv_columns(csv_detail, header, kwargs, stats, optional):
+    """Return the usecols and dtype arguments for reading some columns
+
+    :raises RuntimeError: If the file is missing any of the stats
+    """
+    cols = pd.read_csv(csv_detail['file_name'], header=header, nrows=0,
+                       **kwargs).columns
+    missing = [stat for stat in stats if stat not in cols]
+    if len(missing) > 0:
+        raise RuntimeError("Projections in {} are missing columns: {}".format(
+            csv_detail['file_name'], ", ".join(missing)))
+    keep = set([csv_detail['index_col']] + ID_COLUMNS + list(stats) +
+               list(optional))
+    dtype = {stat: 'float32' for stat in stats}
+    if 'position_type' in cols:
+        dtype['position_type'] = 'category'
+    return {'usecols': [c for c in cols if c in keep], 'dtype': dtype}
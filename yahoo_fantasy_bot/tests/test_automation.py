@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import configparser
+import datetime
+import logging
+import subprocess
+import sys
+import time
+import types
+from yahoo_fantasy_bot import automation
+
+
+def write_cfg(tmpdir, name, run_at=None):
+    cfg = configparser.RawConfigParser()
+    cfg['Connection'] = {'oauthFile': 'oauth2.json'}
+    if run_at is not None:
+        cfg['Daemon'] = {'runAt': run_at}
+    with open(str(tmpdir.join(name)), 'w') as f:
+        cfg.write(f)
+
+
+def test_daemon_next_run(tmpdir):
+    write_cfg(tmpdir, 'a.ini', '08:00, 17:30')
+    write_cfg(tmpdir, 'b.ini')
+    daemon = automation.Daemon(str(tmpdir), True, False, interval=30)
+    cfgs = daemon.load_configs()
+    (a, b) = [cfgs[str(tmpdir.join(n))] for n in ['a.ini', 'b.ini']]
+    now = datetime.datetime(2020, 4, 1, 12, 0)
+    assert(daemon.next_run(a, now) == datetime.datetime(2020, 4, 1, 17, 30))
+    assert(daemon.next_run(a, datetime.datetime(2020, 4, 1, 18, 0)) ==
+           datetime.datetime(2020, 4, 2, 8, 0))
+    assert(daemon.next_run(b, now) == datetime.datetime(2020, 4, 1, 12, 30))
+
+
+def test_daemon_run_due(tmpdir, monkeypatch):
+    write_cfg(tmpdir, 'a.ini', '08:00')
+    write_cfg(tmpdir, 'b.ini')
+    daemon = automation.Daemon(str(tmpdir), True, False)
+    ran = []
+    monkeypatch.setattr(daemon, 'session', lambda cfg: 'session')
+    monkeypatch.setattr(daemon, 'run_league',
+                        lambda fn, cfg, sc: ran.append(fn))
+    now = datetime.datetime.now()
+    assert(daemon.run_due(now) == [str(tmpdir.join('b.ini'))])
+    assert(ran == [str(tmpdir.join('b.ini'))])
+    assert(daemon.run_due(now) == [])
+    assert(all(when > now for when in daemon.next_runs.values()))
+
+
+def test_daemon_skips_bad_leagues(tmpdir, monkeypatch):
+    tmpdir.join('a.ini').write("oauthFile = oauth2.json\n")
+    write_cfg(tmpdir, 'b.ini')
+    write_cfg(tmpdir, 'c.ini', '25:99')
+    daemon = automation.Daemon(str(tmpdir), True, False)
+    ran = []
+    monkeypatch.setattr(daemon, 'session', lambda cfg: 'session')
+    monkeypatch.setattr(daemon, 'run_league',
+                        lambda fn, cfg, sc: ran.append(fn))
+    now = datetime.datetime.now()
+    assert(daemon.run_due(now) == [str(tmpdir.join('b.ini'))])
+    assert(ran == [str(tmpdir.join('b.ini'))])
+    assert(daemon.next_runs[str(tmpdir.join('c.ini'))] is None)
+
+
+def test_daemon_session_lasts_for_run(tmpdir, monkeypatch):
+    made = []
+
+    class FakeOAuth2:
+        def __init__(self, key, secret, from_file):
+            # The token in the file is close to expiring
+            self.token_time = time.time() - 3000
+            self.session = 'old'
+            self.oauth = self
+            made.append(self)
+
+        def refresh_access_token(self):
+            self.token_time = time.time()
+            self.access_token = 'new token'
+
+        def get_session(self, token):
+            return token
+
+    monkeypatch.setattr(automation.import_timer, 'import_module',
+                        lambda name: types.SimpleNamespace(OAuth2=FakeOAuth2))
+    write_cfg(tmpdir, 'a.ini')
+    daemon = automation.Daemon(str(tmpdir), True, False)
+    cfg = daemon.load_configs()[str(tmpdir.join('a.ini'))]
+    sc = daemon.session(cfg)
+    assert(sc.session == 'new token')
+    assert(daemon.session(cfg) is sc)
+    # A session that is running out is replaced, not refreshed in place
+    sc.token_time -= 2000
+    assert(daemon.session(cfg) is not sc)
+    assert(sc.token_time < time.time() - 1800)
+    assert(len(made) == 2)
+
+
+def test_driver_logs_progress(capsys, caplog):
+    class FakeLeague:
+        league_id = '1.l.1'
+
+    class FakeBot:
+        lg = FakeLeague()
+
+    drv = automation.Driver.__new__(automation.Driver)
+    drv.bot = FakeBot()
+    drv.logger = logging.getLogger()
+    drv.log_progress = False
+    drv.progress("Evaluating trades")
+    assert(capsys.readouterr().out == "Evaluating trades\n")
+    drv.log_progress = True
+    with caplog.at_level(logging.INFO):
+        drv.progress("Evaluating trades")
+    assert(capsys.readouterr().out == "")
+    assert(caplog.messages == ["1.l.1: Evaluating trades"])
+
+
+def test_print_cache_report_without_pandas(tmpdir):
+    tmpdir.join("1.l.1").mkdir().join("lg_lineups.pkl").write("x")
+    # Run in a new interpreter so that the modules imported by the other
+    # tests don't count
+    code = ("import configparser, sys\n"
+            "from yahoo_fantasy_bot import automation\n"
+            "cfg = configparser.RawConfigParser()\n"
+            "cfg['Cache'] = {{'dir': {!r}}}\n"
+            "automation.print_cache_report(cfg)\n"
+            "print('pandas' in sys.modules, 'numpy' in sys.modules)\n").format(
+                str(tmpdir))
+    out = subprocess.run([sys.executable, "-c", code], check=True,
+                         capture_output=True, text=True).stdout
+    assert("1.l.1/lg_lineups.pkl" in out)
+    assert(out.splitlines()[-1] == "False False")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+import configparser
+import logging
+import numpy as np
+import pandas as pd
+from yahoo_fantasy_bot import bot, free_agents, utils
+
+
+class FakeScorer:
+    def summarize(self, df):
+        return pd.Series({'HR': df['HR'].sum(), 'SB': df['SB'].sum()})
+
+    def is_highest_better(self, stat):
+        return True
+
+
+def lineup(ids, hr, sb):
+    return pd.DataFrame({'player_id': ids, 'HR': hr, 'SB': sb})
+
+
+def test_league_summary():
+    lineups = {'t.1': lineup([1, 2], [10, 20], [1, 2]),
+               't.2': lineup([3], [5], [7]),
+               't.3': lineup([], [], [])}
+    summ = bot.LeagueSummary.from_lineups(FakeScorer(), lineups)
+    assert(summ.team_keys == ['t.1', 't.2', 't.3'])
+    assert(summ.categories == ['HR', 'SB'])
+    assert(summ.values[0].tolist() == [30.0, 3.0])
+    assert(np.isnan(summ.values[2]).all())
+    assert(summ.lineups is None)
+    assert(summ.rosters[0] == bot.utils.roster_fingerprint([2, 1]))
+
+
+def test_score_comparer_with_summary():
+    cfg = configparser.RawConfigParser()
+    cfg['Scorer'] = {'stdevCap': '3'}
+    lineups = {'t.1': lineup([1], [10], [1]),
+               't.2': lineup([2], [20], [3])}
+    summ = bot.LeagueSummary.from_lineups(FakeScorer(), lineups)
+    sc = bot.ScoreComparer(cfg, FakeScorer(), summ)
+    assert(sc.stdevs['HR'].iloc[0] == np.std([10, 20], ddof=1))
+    sc.set_opponent({'HR': 10, 'SB': 1})
+    assert(sc.compute_score({'HR': 10, 'SB': 1}) == 0)
+
+
+def test_manager_bot_lazy_state():
+    mgr = bot.ManagerBot.__new__(bot.ManagerBot)
+    mgr._pred_bldr = None
+    mgr._score_comparer = None
+    mgr._ppool = None
+    mgr._lineup = None
+    mgr._bench = []
+    mgr._injury_reserve = []
+    calls = []
+
+    def init_prediction_builder():
+        calls.append('pred_bldr')
+        mgr.pred_bldr = 'bldr'
+
+    def sync_lineup():
+        calls.append('sync')
+        assert(mgr.pred_bldr == 'bldr')
+        mgr.lineup = ['a']
+        mgr.bench = ['b']
+        mgr.injury_reserve = []
+
+    mgr.init_prediction_builder = init_prediction_builder
+    mgr.sync_lineup = sync_lineup
+    mgr.pick_injury_reserve = lambda: calls.append('ir')
+    assert(calls == [])
+    assert(mgr.bench == ['b'])
+    assert(mgr.lineup == ['a'])
+    assert(calls == ['sync', 'pred_bldr', 'ir'])
+
+
+class FakeYHandler:
+    def get_players_raw(self, league_id, start, status, position=None):
+        end = min(start + free_agents.PLAYERS_PER_PAGE, 60)
+        return [{'player_id': i, 'name': 'Player {}'.format(i)}
+                for i in range(start, end)]
+
+
+class FakeLeague:
+    league_id = '1.l.1'
+    yhandler = FakeYHandler()
+
+    def _players_from_page(self, page):
+        return (len(page), page)
+
+
+def test_optimize_streams_free_agents_on_cold_cache(tmpdir):
+    cfg = configparser.RawConfigParser()
+    cfg.read_dict({'Cache': {'dir': str(tmpdir), 'freeAgentExpiry': '60'},
+                   'League': {'id': '1.l.1'},
+                   'LineupOptimizer': {'streamFreeAgents': 'true',
+                                       'lockPlayersAbovePctOwn': '100',
+                                       'lockPlayerFile': ''}})
+    mgr = bot.ManagerBot.__new__(bot.ManagerBot)
+    mgr.logger = logging.getLogger()
+    mgr.cfg = cfg
+    mgr.lg = FakeLeague()
+    mgr.tm_cache = utils.TeamCache(cfg, '1.l.1.t.1')
+    mgr.lg_statics = bot.LeagueStatics(
+        pos={'C': {'position_type': 'B', 'count': 1}}, ir_spots=0,
+        bn_spots=0, settings={}, cats=[], ir_name=None)
+    mgr.fa_stream = None
+    mgr.my_team_bldr = None
+    mgr._pred_bldr = None
+    mgr._score_comparer = 'comparer'
+    mgr._ppool = None
+    mgr._lineup = []
+    mgr._bench = []
+    mgr._injury_reserve = []
+    mgr.fetch_cur_lineup = lambda: []
+    mgr._call_predict = lambda plyrs, fail_on_missing: pd.DataFrame(
+        {'player_id': [e['player_id'] for e in plyrs],
+         'name': [e['name'] for e in plyrs],
+         'percent_owned': 50, 'status': ''})
+    seen = []
+
+    def optimizer(cfg, score_comparer, roster_bldr, avail_plyrs,
+                  locked_plyrs, pool_feed=None):
+        assert(pool_feed is not None)
+        seen.extend(avail_plyrs['player_id'])
+        while mgr.fa_stream is not None:
+            df = pool_feed()
+            if df is not None:
+                seen.extend(df['player_id'])
+        return None
+    mgr._get_lineup_optimizer_function = lambda: optimizer
+
+    assert(not mgr.optimize_lineup_from_free_agents())
+    assert(sorted(seen) == list(range(60)))
+    assert(sorted(mgr.ppool['player_id']) == list(range(60)))
+    assert(mgr.tm_cache.has_free_agents('C'))
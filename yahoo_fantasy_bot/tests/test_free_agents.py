@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+import yahoo_fantasy_api as yfa
+from yahoo_fantasy_bot import free_agents
+
+
+class FakeYHandler:
+    def __init__(self, num_plyrs):
+        self.num_plyrs = num_plyrs
+
+    def get_players_raw(self, league_id, start, status, position=None):
+        end = min(start + free_agents.PLAYERS_PER_PAGE,
+                  self.num_plyrs[position])
+        return [{'player_id': i, 'name': 'Player {}'.format(i),
+                 'position': position}
+                for i in range(start, end)]
+
+
+class FakeLeague:
+    def __init__(self, num_plyrs):
+        self.league_id = '1.l.1'
+        self.yhandler = FakeYHandler(num_plyrs)
+
+    def _players_from_page(self, page):
+        return (len(page), page)
+
+
+def test_slice_positions():
+    assert(free_agents.slice_positions(
+        ['C', '1B', '2B', 'SS', 'Util', 'SP', 'RP', 'P']) ==
+        ['C', '1B', '2B', 'SS', 'Util', 'SP', 'RP'])
+    assert(free_agents.slice_positions(['C', 'LW', 'D', 'F', 'G']) ==
+           ['C', 'LW', 'D', 'F', 'G'])
+    assert(free_agents.slice_positions(['C', 'LW', 'RW', 'D', 'Util',
+                                        'G']) ==
+           ['C', 'LW', 'RW', 'D', 'G'])
+    assert(free_agents.slice_positions(['C', 'P']) == ['C', 'P'])
+
+
+def test_merge_slices():
+    fa = free_agents.merge_slices({'C': [{'player_id': 1}, {'player_id': 2}],
+                                   '1B': [{'player_id': 2},
+                                          {'player_id': 3}]})
+    assert([e['player_id'] for e in fa] == [1, 2, 3])
+
+
+def test_download_slices():
+    lg = FakeLeague({'C': 60, 'G': 50, 'D': 0})
+    dl = free_agents.Downloader(lg, ['C', 'G', 'D'], workers=3,
+                                pages_in_flight=3)
+    slices = dl.run()
+    assert(len(slices['C']) == 60)
+    assert([e['player_id'] for e in slices['C']] == list(range(60)))
+    assert(len(slices['G']) == 50)
+    assert(len(slices['D']) == 0)
+
+
+def test_stream_all_pages():
+    lg = FakeLeague({'C': 60, 'G': 10})
+    s = free_agents.Streamer(free_agents.Downloader(lg, ['C', 'G']))
+    s.start()
+    pages = s.poll(wait=True)
+    assert(len(pages) >= 1)
+    pages += s.drain()
+    assert(s.done())
+    assert(sorted([len(p) for p in pages]) == [10, 10, 25, 25])
+    slices = s.join()
+    assert(len(slices['C']) == 60)
+    assert(len(slices['G']) == 10)
+    assert(s.poll() == [])
+
+
+class FakeRawYHandler:
+    """Serves pages in the raw JSON layout of Yahoo!'s players resource"""
+    def __init__(self, num_plyrs):
+        self.num_plyrs = num_plyrs
+        self.calls = []
+
+    def get_players_raw(self, league_id, start, status, position=None):
+        self.calls.append((league_id, start, status, position))
+        end = max(start, min(start + free_agents.PLAYERS_PER_PAGE,
+                             self.num_plyrs))
+        players = {}
+        for i, plyr_id in enumerate(range(start, end)):
+            plyr_status = [{'status': 'NA'}] if plyr_id == 1 else []
+            players[str(i)] = {'player': [
+                [{'player_key': '1.p.{}'.format(plyr_id)},
+                 {'player_id': str(plyr_id)},
+                 {'name': {'full': 'Player {}'.format(plyr_id)}},
+                 {'position_type': 'P'}] + plyr_status +
+                [{'eligible_positions': [{'position': position}]}],
+                {'percent_owned': [{'coverage_type': 'week'},
+                                   {'value': plyr_id}]}]}
+        players['count'] = end - start
+        if end == start:
+            players = []
+        return {'fantasy_content': {'league': [{'league_key': league_id},
+                                               {'players': players}]}}
+
+
+def test_fetch_page_against_yahoo_fantasy_api():
+    # Runs the real League code so a change to the private API we lean on
+    # shows up here rather than as a broken download.
+    lg = yfa.League(None, '1.l.1')
+    lg.yhandler = FakeRawYHandler(27)
+    (num_plyrs, fa) = free_agents.fetch_page(lg, 0, 'SP')
+    assert(num_plyrs == 25)
+    assert(lg.yhandler.calls == [('1.l.1', 0, 'FA', 'SP')])
+    assert([e['player_id'] for e in fa] == [0] + list(range(2, 25)))
+    assert(fa[0]['name'] == 'Player 0')
+    assert(fa[0]['eligible_positions'] == ['SP'])
+    assert(fa[3]['percent_owned'] == 4)
+    assert(free_agents.fetch_page(lg, 25, 'SP')[0] == 2)
+    assert(free_agents.fetch_page(lg, 50, 'SP') == (0, []))
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+
+import io
+import sys
+from yahoo_fantasy_bot import import_timer
+
+
+def test_import_module(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'yahoo_fantasy_bot.schedule',
+                        raising=False)
+    monkeypatch.setattr(import_timer, 'import_times', {})
+    mod = import_timer.import_module('.schedule', package='yahoo_fantasy_bot')
+    assert(mod.__name__ == 'yahoo_fantasy_bot.schedule')
+    assert(list(import_timer.import_times) == ['yahoo_fantasy_bot.schedule'])
+    # Modules that are already loaded aren't timed again
+    assert(import_timer.import_module('yahoo_fantasy_bot.schedule') is mod)
+    assert(len(import_timer.import_times) == 1)
+    out = io.StringIO()
+    import_timer.report(out)
+    assert('yahoo_fantasy_bot.schedule' in out.getvalue())
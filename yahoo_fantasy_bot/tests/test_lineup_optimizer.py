@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+
+import logging
+import pandas as pd
+from yahoo_fantasy_bot import lineup_optimizer
+
+
+def test_extend_player_pool_by_id_column():
+    algo = lineup_optimizer.GeneticAlgorithm.__new__(
+        lineup_optimizer.GeneticAlgorithm)
+    algo.logger = logging.getLogger()
+    algo.player_id_col = 'playerid'
+    algo.ppool = pd.DataFrame({'playerid': ['a', 'b'], 'name': ['A', 'B']})
+    algo.extend_player_pool(pd.DataFrame({'playerid': ['b', 'c'],
+                                          'name': ['B', 'C']}))
+    assert(algo.ppool['playerid'].to_list() == ['a', 'b', 'c'])
+    algo.extend_player_pool(None)
+    assert(len(algo.ppool.index) == 3)
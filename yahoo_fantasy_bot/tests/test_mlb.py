@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+import configparser
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from baseball_id import lookup
+from baseball_scraper import fangraphs
+from yahoo_fantasy_bot import mlb, utils
+
+
+@pytest.fixture
+def bldr():
+    lk = lookup.Cache(None)
+    names = ['Joe Able', 'Bo Bee', 'Cy Rookie', 'Dee Dup', 'Dee Dup',
+             'Jose Acento']
+    lk.df = pd.DataFrame(
+        dict({c: names for c in mlb.NAME_COLUMNS},
+             yahoo_id=[1, 2, np.nan, np.nan, np.nan, 6],
+             fg_id=['a', 'b', 'c', 'd1', 'd2', 'f'],
+             espn_id=[11, 12, 13, 14, 15, 16]))
+    b = mlb.Builder.__new__(mlb.Builder)
+    b.set_id_lookup(lk)
+    yield b
+
+
+def plyr(pid, name, pt='B', **kwargs):
+    return dict({'player_id': pid, 'name': name, 'position_type': pt,
+                 'eligible_positions': ['1B'], 'status': ''}, **kwargs)
+
+
+def test_find_roster(bldr):
+    roster = [plyr(2, 'Bo Bee', percent_owned=50),
+              plyr(3, 'Cy Rookie'),
+              plyr(7, 'José Acento'),
+              plyr(1, 'Joe Able', selected_position='BN'),
+              plyr(9, 'Pitcher Guy', pt='P')]
+    lk = bldr._find_roster('B', roster)
+    assert(lk.player_id.to_list() == [2, 3, 7])
+    assert(lk.fg_id.to_list() == ['b', 'c', 'f'])
+    assert(lk.name.to_list() == ['Bo Bee', 'Cy Rookie',
+                                 'José Acento'])
+    assert(lk.percent_owned.iloc[0] == 50)
+    assert(np.isnan(lk.percent_owned.iloc[1]))
+
+
+def test_find_roster_missing(bldr):
+    roster = [plyr(2, 'Bo Bee'), plyr(4, 'Dee Dup')]
+    with pytest.raises(ValueError):
+        bldr._find_roster('B', roster)
+    lk = bldr._find_roster('B', roster, fail_on_missing=False)
+    assert(lk.player_id.to_list() == [2])
+    assert(bldr._find_roster('P', roster) is None)
+
+
+def test_find_roster_duplicate_id(bldr):
+    bldr.id_lookup.df.loc[2, 'yahoo_id'] = 2
+    roster = [plyr(1, 'Joe Able'), plyr(2, 'Bo Bee')]
+    with pytest.raises(ValueError):
+        bldr._find_roster('B', roster)
+    lk = bldr._find_roster('B', roster, fail_on_missing=False)
+    assert(lk.player_id.to_list() == [1])
+
+
+def test_select_players_csv(bldr):
+    bldr.source = 'csv'
+    bldr.ppool = mlb.utils.ColumnFrame(pd.DataFrame(
+        {'playerid': ['c', 'a', 'b'], 'HR': [1.0, 2.0, 3.0]},
+        index=pd.Index(['Cy', 'Joe', 'Bo'], name='Name')))
+    plyrs = list(bldr.select_players([plyr(3, 'Cy Rookie'),
+                                      plyr(1, 'Joe Able', status='DTD')]))
+    assert([p['player_id'] for p in plyrs] == [3, 1])
+    assert([p['HR'] for p in plyrs] == [1.0, 2.0])
+    assert([p['espn_id'] for p in plyrs] == [13, 11])
+    assert(plyrs[1]['status'] == 'DTD')
+
+
+def test_predict_reuses_table(bldr):
+    bldr.pred_table = None
+    bldr.pred_table_args = None
+    bldr.unresolved = set()
+    bldr.scrape_cache = utils.LRUCache()
+    predicted = []
+
+    def predict_players(plyrs, fail_on_missing, scrape_id_system, team_has):
+        predicted.append([e['player_id'] for e in plyrs])
+        found = [e for e in plyrs if e['player_id'] != 4]
+        return pd.DataFrame({'player_id': [e['player_id'] for e in found],
+                             'HR': [e['player_id'] * 10 for e in found],
+                             'name': [e['name'] for e in found]})
+    bldr._predict_players = predict_players
+
+    roster = [plyr(9, 'Pitcher Guy', pt='P'), plyr(2, 'Bo Bee'),
+              plyr(1, 'Joe Able', selected_position='BN')]
+    df = bldr.predict(roster, fail_on_missing=False)
+    assert(df.player_id.to_list() == [2, 9])
+    assert(df.HR.to_list() == [20, 90])
+    assert(np.isnan(df.selected_position.iloc[0]))
+
+    roster = [plyr(2, 'Bo Bee', eligible_positions=['2B'], percent_owned=5),
+              plyr(4, 'Dee Dup'), plyr(3, 'Cy Rookie')]
+    df = bldr.predict(roster, fail_on_missing=False)
+    assert(df.player_id.to_list() == [2, 3])
+    assert(df.eligible_positions.iloc[0] == ['2B'])
+    assert(df.percent_owned.to_list()[0] == 5)
+    bldr.predict(roster, fail_on_missing=False)
+    assert(predicted == [[9, 2], [4, 3]])
+
+
+def test_predict_table_is_cached_by_column(bldr, tmpdir):
+    bldr.pred_table = None
+    bldr.pred_table_args = None
+    bldr.unresolved = set()
+    bldr.scrape_cache = utils.LRUCache()
+    bldr.ppool = utils.ColumnFrame(pd.DataFrame({'HR': [1.0]}))
+    bldr.ts = bldr.es = bldr.tss = None
+    bldr.wk_start_date = datetime.date(2020, 4, 6)
+    bldr.wk_end_date = datetime.date(2020, 4, 12)
+    bldr.season_end_date = datetime.date(2020, 12, 31)
+    bldr.use_weekly_schedule = False
+    bldr.source = 'yahoo'
+    bldr.build_id = 'build1'
+
+    # Player 2 matches two rows of the pool
+    def predict_players(plyrs, fail_on_missing, scrape_id_system, team_has):
+        return pd.DataFrame({'player_id': [1, 2, 2], 'HR': [10, 20, 21],
+                             'name': ['Joe Able', 'Bo Bee', 'Bo Bee']})
+    bldr._predict_players = predict_players
+    roster = [plyr(1, 'Joe Able'), plyr(2, 'Bo Bee', status='DTD')]
+    df = bldr.predict(roster)
+    assert(df.player_id.to_list() == [1, 2])
+    assert(df.HR.to_list() == [10, 20])
+    assert(df.status.to_list() == ['', 'DTD'])
+
+    cfg = configparser.RawConfigParser()
+    cfg.read_dict({'Cache': {'dir': str(tmpdir)}, 'League': {'id': '1.l.1'}})
+    lc = utils.LeagueCache(cfg)
+    lc.load_prediction_builder(None, lambda: bldr)
+    cached = lc.load_prediction_builder(None, lambda: None)
+    assert(isinstance(cached.pred_table, utils.ColumnFrame))
+    assert(cached.pred_table.path is not None)
+    cached._predict_players = None
+    df = cached.predict(roster)
+    assert(df.player_id.to_list() == [1, 2])
+    assert(df.HR.to_list() == [10, 20])
+    assert(not cached.new_predictions)
+
+
+def test_merge_predictions(bldr, tmpdir):
+    bldr.pred_table = None
+    bldr.pred_table_args = None
+    bldr.unresolved = set()
+    bldr.scrape_cache = utils.LRUCache()
+    bldr.ppool = utils.ColumnFrame(pd.DataFrame({'HR': [1.0]}))
+    bldr.ts = bldr.es = bldr.tss = None
+    bldr.wk_start_date = datetime.date(2020, 4, 6)
+    bldr.wk_end_date = datetime.date(2020, 4, 12)
+    bldr.season_end_date = datetime.date(2020, 12, 31)
+    bldr.use_weekly_schedule = False
+    bldr.source = 'csv'
+    bldr.build_id = 'build1'
+    cfg = configparser.RawConfigParser()
+    cfg.read_dict({'Cache': {'dir': str(tmpdir)}, 'League': {'id': '1.l.1'}})
+    lc = utils.LeagueCache(cfg)
+    fn = lc.prediction_builder_file()
+    lc.load_prediction_builder(None, lambda: bldr)
+
+    def predict_players(plyrs, fail_on_missing, scrape_id_system, team_has):
+        return pd.DataFrame({'player_id': [e['player_id'] for e in plyrs],
+                             'HR': [e['player_id'] * 10 for e in plyrs]})
+
+    # Two runs each predict a player that the cached builder doesn't have
+    for pid in [1, 2]:
+        run_bldr = lc.load_prediction_builder(None, lambda: None)
+        run_bldr._predict_players = predict_players
+        run_bldr.predict([plyr(pid, 'Player {}'.format(pid))])
+        assert(run_bldr.new_predictions)
+        lc.update(fn, lambda cached: cached.merge_predictions(run_bldr))
+    cached = lc.load_prediction_builder(None, lambda: None)
+    assert(sorted(cached.pred_table.column('HR').tolist()) == [10, 20])
+
+    # Predictions of a builder that has since been rebuilt are dropped
+    run_bldr.build_id = 'build0'
+    run_bldr.predict([plyr(3, 'Player 3')])
+    lc.update(fn, lambda cached: cached.merge_predictions(run_bldr))
+    cached = lc.load_prediction_builder(None, lambda: None)
+    assert(len(cached.pred_table) == 2)
+
+
+def test_generic_csv_scraper(tmpdir):
+    fns = []
+    for (typ, stat) in [('bat', 'HR'), ('pit', 'K')]:
+        fn = str(tmpdir.join(typ + '.csv'))
+        with open(fn, 'w', encoding='iso-8859-1') as f:
+            f.write("Projections\n")
+            f.write("Firstname,Lastname,Tm,MLBAM ID,{}\n".format(stat))
+            f.write("José,Acento,SEA,100,10\n")
+            f.write("Bo,Bee,NYY,200,20\n")
+            f.write("Total,,,,30\n")
+        fns.append(fn)
+    scraper = mlb.GenericCsvScraper(*fns)
+    df = scraper.scrape([200, 300], fangraphs.ScrapeType.HITTER)
+    assert(df['MLBAM ID'].to_list() == [200])
+    assert(df.Name.to_list() == ['Bo Bee'])
+    assert(df.Team.to_list() == ['NYY'])
+    df = scraper.scrape([100], fangraphs.ScrapeType.PITCHER)
+    assert(df.Name.to_list() == ['José Acento'])
+    assert(df.SO.to_list() == [10])
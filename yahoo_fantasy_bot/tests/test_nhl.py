@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import datetime
+import numpy as np
+import pandas as pd
+from yahoo_fantasy_bot import nhl, schedule, utils
+
+
+def test_predict():
+    bldr = nhl.Builder.__new__(nhl.Builder)
+    bldr.ppool = utils.ColumnFrame(pd.DataFrame(
+        {'G': [10.0, 20.0, 30.0]},
+        index=pd.Index(['Joe Able', 'Bo Bee', 'Cy Rookie'], name='name')))
+    bldr.nhl_players = pd.DataFrame({'name': ['Joe Able', 'Bo Bee'],
+                                     'teamId': [1, 2], 'playerId': [11, 12]})
+    bldr.name_indexes = None
+    bldr.wk_start_date = datetime.date(2020, 1, 6)
+    bldr.wk_end_date = datetime.date(2020, 1, 12)
+    sched = schedule.Schedule([1, 2], datetime.date(2020, 1, 1),
+                              datetime.date(2020, 1, 31))
+    sched.add_games(1, [datetime.date(2020, 1, d) for d in [5, 6, 8, 12]])
+    sched.add_games(2, [datetime.date(2020, 1, 7)])
+    bldr.set_schedule(sched)
+
+    plyrs = [{'player_id': 3, 'name': 'Cy Rookie'},
+             {'player_id': 1, 'name': 'Joe Able'},
+             {'player_id': 2, 'name': 'Bo Bee'},
+             {'player_id': 4, 'name': 'Not Found'}]
+    df = bldr.predict(plyrs)
+    assert(df.player_id.to_list() == [3, 1, 2])
+    assert(df.G.to_list() == [30.0, 10.0, 20.0])
+    assert(df.WK_G.to_list() == [0, 3, 1])
+    assert(np.isnan(df.team_id.iloc[0]))
+    assert(df.team_id.to_list()[1:] == [1, 2])
+
+
+def test_predict_ambiguous_names(caplog):
+    bldr = nhl.Builder.__new__(nhl.Builder)
+    bldr.ppool = utils.ColumnFrame(pd.DataFrame(
+        {'G': [10.0, 20.0, 30.0], 'player_id': [1, 2, 3]},
+        index=pd.Index(['Sebastian Aho', 'Sebastian Aho', 'Joe Able'],
+                       name='name')))
+    bldr.nhl_players = pd.DataFrame(
+        {'name': ['Sebastian Aho', 'Sebastian Aho', 'Joe Able', 'Joe Able'],
+         'teamId': [1, 2, 1, 2], 'playerId': [11, 12, 13, 14]})
+    bldr.nhl_scraper = FakeScraper()
+    bldr.name_indexes = None
+    bldr.wk_start_date = datetime.date(2020, 1, 6)
+    bldr.wk_end_date = datetime.date(2020, 1, 12)
+    sched = schedule.Schedule([1, 2], datetime.date(2020, 1, 1),
+                              datetime.date(2020, 1, 31))
+    sched.add_games(1, [datetime.date(2020, 1, d) for d in [6, 8]])
+    sched.add_games(2, [datetime.date(2020, 1, 7)])
+    bldr.set_schedule(sched)
+
+    # The projections are matched by Yahoo! ID and the team by abbreviation
+    plyrs = [{'player_id': 2, 'name': 'Sebastian Aho',
+              'editorial_team_abbr': 'Bbb'},
+             {'player_id': 1, 'name': 'Sebastian Aho',
+              'editorial_team_abbr': 'AAA'},
+             {'player_id': 3, 'name': 'Joe Able'}]
+    df = bldr.predict(plyrs)
+    assert(df.player_id.to_list() == [2, 1, 3])
+    assert(df.G.to_list() == [20.0, 10.0, 30.0])
+    assert(df.team_id.to_list()[:2] == [2, 1])
+    assert(df.WK_G.to_list() == [1, 2, 0])
+    assert(np.isnan(df.team_id.iloc[2]))
+    assert("Unable to tell which team Joe Able is on" in caplog.text)
+
+    # Without a player_id column a duplicated name is skipped
+    bldr.ppool = utils.ColumnFrame(bldr.ppool.to_frame()[['G']])
+    bldr.name_indexes = None
+    df = bldr.predict(plyrs)
+    assert(df.player_id.to_list() == [3])
+    assert("Their name matches 2 players" in caplog.text)
+
+
+def test_player_teams_not_pickled():
+    bldr = nhl.Builder.__new__(nhl.Builder)
+    bldr.ppool = utils.ColumnFrame(pd.DataFrame(
+        {'G': [10.0]}, index=pd.Index(['Joe Able'], name='name')))
+    bldr.schedule = None
+    bldr.name_indexes = None
+    bldr.set_player_teams(pd.DataFrame({'name': ['Joe Able'], 'teamId': [1],
+                                        'playerId': [11]}))
+    (_, team_index) = bldr._get_name_indexes()
+    assert(team_index.unique('Joe Able') == 1)
+    state = bldr.__getstate__()
+    assert(state['nhl_players'] is None)
+    assert(state['name_indexes'] is None)
+
+    bldr.set_player_teams(pd.DataFrame({'name': ['Joe Able'], 'teamId': [2],
+                                        'playerId': [11]}))
+    (_, team_index) = bldr._get_name_indexes()
+    assert(team_index.unique('Joe Able') == 2)
+
+
+class FakeEndpointAdapter:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, api):
+        self.calls.append(api)
+        if api == 'players':
+            return {'teams': [{'id': 1, 'roster': {'roster': [
+                {'person': {'id': 11, 'fullName': 'Joe Able'}}]}}]}
+        if not api.startswith("schedule?startDate=2020-01-01"):
+            return {'dates': []}
+
+        def game(away, home):
+            return {'teams': {'away': {'team': {'id': away}},
+                              'home': {'team': {'id': home}}}}
+        return {'dates': [{'date': '2020-01-02', 'games': [game(1, 2)]},
+                          {'date': '2020-01-05', 'games': [game(2, 1)]}]}
+
+    def players_endpoint(self, team_ids):
+        return self.get('players')
+
+
+class FakeScraper(nhl.Scraper):
+    def __init__(self):
+        super(FakeScraper, self).__init__()
+        self.set_endpoint_adapter(FakeEndpointAdapter())
+
+    def teams(self):
+        return pd.DataFrame({'id': [1, 2, 3],
+                             'abbrev': ['AAA', 'BBB', 'CCC']})
+
+
+def test_build_schedule():
+    bldr = nhl.Builder.__new__(nhl.Builder)
+    bldr.nhl_scraper = FakeScraper()
+    bldr.schedule_dates = (datetime.date(2020, 1, 1),
+                           datetime.date(2020, 3, 15))
+    sched = bldr.build_schedule()
+    assert(bldr.nhl_scraper.ea.calls == [
+        "schedule?startDate=2020-01-01&endDate=2020-01-31",
+        "schedule?startDate=2020-02-01&endDate=2020-02-29",
+        "schedule?startDate=2020-03-01&endDate=2020-03-15"])
+    assert(sched.games[:, :6].tolist() == [[0, 1, 0, 0, 1, 0],
+                                           [0, 1, 0, 0, 1, 0],
+                                           [0, 0, 0, 0, 0, 0]])
+
+
+def test_player_teams_are_fetched_each_time():
+    bldr = nhl.Builder.__new__(nhl.Builder)
+    bldr.nhl_scraper = FakeScraper()
+    for _ in range(2):
+        df = bldr.build_player_teams()
+        assert(df.to_dict('records') == [{'teamId': 1, 'playerId': 11,
+                                          'name': 'Joe Able'}])
+    assert(bldr.nhl_scraper.ea.calls == ['players', 'players'])
+    assert(bldr.nhl_scraper.players_cache is None)
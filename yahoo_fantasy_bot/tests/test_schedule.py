@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+import datetime
+from yahoo_fantasy_bot import schedule
+
+
+def test_games_between():
+    d = datetime.date
+    sched = schedule.Schedule(['SEA', 'TOR'], d(2020, 4, 1), d(2020, 4, 30))
+    sched.add_games('SEA', [d(2020, 4, 1), d(2020, 4, 2), d(2020, 4, 2),
+                            d(2020, 4, 10), d(2020, 5, 1)])
+    sched.add_games('TOR', [d(2020, 4, 30)])
+    assert(sched.games_between('SEA', d(2020, 4, 1), d(2020, 4, 30)) == 4)
+    assert(sched.games_between('SEA', d(2020, 4, 2), d(2020, 4, 2)) == 2)
+    assert(sched.games_between('SEA', d(2020, 4, 3), d(2020, 4, 9)) == 0)
+    assert(sched.games_between('TOR', d(2020, 4, 30), d(2020, 4, 30)) == 1)
+    assert(sched.games_between_for_teams(
+        ['SEA', None, 'TOR', 'NYY'], d(2020, 3, 1),
+        d(2020, 6, 1)).tolist() == [4, 0, 1, 0])
+    assert(sched.covers(d(2020, 4, 5), d(2020, 4, 11)))
+    assert(not sched.covers(d(2020, 4, 5), d(2020, 5, 11)))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+import pytest
+from yahoo_fantasy_bot import source
+
+
+@pytest.fixture
+def csv_detail(tmpdir):
+    fn = str(tmpdir.join('hitters.csv'))
+    with open(fn, 'w') as f:
+        f.write("Name,Team,playerid,HR,R,Notes\n")
+        f.write("Bo Bee,NYY,b,20,-,x\n")
+        f.write("Joe Able,SEA,a,10,50,y\n")
+    return {'file_name': fn, 'index_col': 'Name', 'header': 0}
+
+
+def test_read_csv_all_columns(csv_detail):
+    df = source.read_csv(csv_detail)
+    assert(df.columns.to_list() == ['Team', 'playerid', 'HR', 'R', 'Notes'])
+
+
+def test_read_csv_stats(csv_detail):
+    df = source.read_csv(csv_detail, ['HR', 'R'], ['Team', 'Other'])
+    assert(df.columns.to_list() == ['Team', 'playerid', 'HR', 'R'])
+    assert(df.HR.dtype == 'float32')
+    assert(df.loc['Joe Able', 'R'] == 50)
+    assert(df.R.isna().sum() == 1)
+
+
+def test_read_csv_missing_stats(csv_detail):
+    with pytest.raises(RuntimeError):
+        source.read_csv(csv_detail, ['HR', 'SB'])
@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+
+import configparser
+import datetime
+import glob
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import numpy as np
+import pandas as pd
+from yahoo_fantasy_bot import utils
+
+
+@pytest.fixture
+def cfg(tmpdir):
+    c = configparser.RawConfigParser()
+    c['Cache'] = {'dir': str(tmpdir)}
+    c['League'] = {'id': '1.l.1'}
+    yield c
+
+
+def test_run_loader_builds_once(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    calls = []
+    assert(tc.run_loader(fn, None, lambda: calls.append(1) or [1, 2]) ==
+           [1, 2])
+    assert(tc.run_loader(fn, None, lambda: calls.append(1) or [3]) == [1, 2])
+    assert(len(calls) == 1)
+    assert(tc.is_fresh(fn))
+
+
+def test_run_loader_expired(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    tc.run_loader(fn, datetime.timedelta(minutes=-1), lambda: 'old')
+    assert(not tc.is_fresh(fn))
+    assert(tc.run_loader(fn, None, lambda: 'new') == 'new')
+
+
+def test_run_loader_serves_stale_while_refreshing(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    tc.run_loader(fn, datetime.timedelta(minutes=-1), lambda: 'old',
+                  grace=datetime.timedelta(minutes=10))
+    assert(not tc.is_fresh(fn))
+    assert(tc.is_usable(fn))
+    assert(tc.run_loader(fn, datetime.timedelta(minutes=10),
+                         lambda: 'new') == 'old')
+    tc.wait_for_refreshes()
+    assert(tc.is_fresh(fn))
+    assert(tc.run_loader(fn, None, lambda: 'newer') == 'new')
+
+
+def test_run_loader_refreshes_with_isolated_loader(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    tc.run_loader(fn, datetime.timedelta(minutes=-1), lambda: 'old',
+                  grace=datetime.timedelta(minutes=10))
+    release = threading.Event()
+
+    def isolated_loader():
+        release.wait()
+        return 'isolated'
+    assert(tc.run_loader(fn, datetime.timedelta(minutes=10),
+                         lambda: 'shared',
+                         isolated_loader=isolated_loader) == 'old')
+    assert(tc.refreshes[fn].daemon)
+    assert(not tc.wait_for_refreshes(timeout=0.1))
+    release.set()
+    assert(tc.wait_for_refreshes(timeout=10))
+    assert(tc.run_loader(fn, None, lambda: 'newer') == 'isolated')
+
+
+def test_run_loader_past_grace(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    tc.run_loader(fn, datetime.timedelta(minutes=-10), lambda: 'old',
+                  grace=datetime.timedelta(minutes=5))
+    assert(not tc.is_usable(fn))
+    assert(tc.run_loader(fn, None, lambda: 'new') == 'new')
+
+
+@pytest.mark.parametrize("contents", [False, True])
+def test_run_loader_fingerprint(cfg, tmpdir, contents):
+    csv = tmpdir.join("hitters.csv")
+    csv.write("Name,HR\nA,1\n")
+    cfg['Prediction'] = {'source': 'csv', 'hitters_csv_file': str(csv)}
+    lc = utils.LeagueCache(cfg)
+    fn = lc.prediction_builder_file()
+
+    def fp():
+        return utils.fingerprint(cfg, ['Prediction'], [str(csv)], contents)
+
+    lc.run_loader(fn, None, lambda: 'v1', fingerprint=fp())
+    assert(lc.run_loader(fn, None, lambda: 'v2', fingerprint=fp()) == 'v1')
+    csv.write("Name,HR\nA,1\nB,22\n")
+    assert(lc.run_loader(fn, None, lambda: 'v3', fingerprint=fp()) == 'v3')
+    cfg['Prediction']['source'] = 'yahoo'
+    assert(lc.run_loader(fn, None, lambda: 'v4', fingerprint=fp()) == 'v4')
+
+
+def test_old_version_is_rebuilt(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    with open(fn, "wb") as f:
+        pickle.dump({"expiry": None, "payload": "unversioned"}, f)
+    assert(not tc.is_fresh(fn))
+    assert(tc.run_loader(fn, None, lambda: 'rebuilt') == 'rebuilt')
+
+
+def test_corrupt_file_is_rebuilt(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    with open(fn, "wb") as f:
+        f.write(b'garbage')
+    assert(tc.run_loader(fn, None, lambda: 'rebuilt') == 'rebuilt')
+
+
+@pytest.mark.parametrize("compression", ['gzip', 'bz2', 'lzma'])
+def test_compression(cfg, compression):
+    cfg['Cache']['compression'] = compression
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    tc.run_loader(fn, None, lambda: list(range(100)))
+    # Files are readable regardless of the compression setting
+    cfg['Cache']['compression'] = 'none'
+    tc = utils.TeamCache(cfg, '1.l.1.t.1')
+    assert(tc.run_loader(fn, None, lambda: []) == list(range(100)))
+
+
+@pytest.mark.parametrize("compression", ['none', 'gzip', 'bz2', 'lzma'])
+def test_expiry_is_read_from_header(cfg, monkeypatch, compression):
+    cfg['Cache']['compression'] = compression
+    tc = utils.TeamCache(cfg, '1.l.1.t.1')
+    fn = tc.free_agents_cache_file('C')
+    tc.load_free_agents('C', datetime.timedelta(minutes=-1), lambda: [],
+                        grace=datetime.timedelta(minutes=10))
+
+    # The payload isn't read to check the expiry
+    def fail(*args):
+        raise AssertionError("payload was read")
+    monkeypatch.setattr(utils, '_ColumnUnpickler', fail)
+    assert(not tc.is_fresh(fn))
+    assert(tc.is_usable(fn))
+    assert(tc.has_free_agents('C'))
+    assert(not tc.is_usable(tc.free_agents_cache_file('1B')))
+
+
+def test_single_flight(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.league_lineup_file()
+    calls = []
+    results = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'built'
+
+    threads = [threading.Thread(
+        target=lambda: results.append(tc.run_loader(fn, None, loader)))
+        for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert(len(calls) == 1)
+    assert(results == ['built'] * 4)
+
+
+def test_free_agents_journal(cfg):
+    tc = utils.TeamCache(cfg, '1.l.1.t.1')
+    tc.load_free_agents('C', None,
+                        lambda: [{'player_id': 1}, {'player_id': 2}])
+    tc.journal_free_agents([{'player_id': 1, 'name': 'Joe'}])
+    assert(tc.load_free_agents('C', None, lambda: []) == [{'player_id': 2}])
+    tc.remove()
+    assert(not tc.has_free_agents('C'))
+    assert(not os.path.exists(tc.free_agents_journal_file()))
+
+
+def test_free_agents_journal_skips_older_entries(cfg):
+    tc = utils.TeamCache(cfg, '1.l.1.t.1')
+    tc.load_free_agents('C', datetime.timedelta(minutes=-1),
+                        lambda: [{'player_id': 1}, {'player_id': 2}])
+    tc.journal_free_agents([{'player_id': 1}])
+    time.sleep(0.01)
+    # Player 1 was released again before the slice was downloaded
+    assert(tc.load_free_agents('C', None,
+                               lambda: [{'player_id': 1}, {'player_id': 2}])
+           == [{'player_id': 1}, {'player_id': 2}])
+    tc.journal_free_agents([{'player_id': 2}])
+    assert(tc.load_free_agents('C', None, lambda: []) == [{'player_id': 1}])
+
+
+def test_free_agents_journal_compaction(cfg):
+    cfg['Cache']['freeAgentJournalCompactAt'] = '3'
+    tc = utils.TeamCache(cfg, '1.l.1.t.1')
+    fa = [{'player_id': i} for i in range(10)]
+    tc.load_free_agents('C', None, lambda: fa)
+    for i in range(3):
+        tc.journal_free_agents([{'player_id': i}])
+    assert(os.path.getsize(tc.free_agents_journal_file()) == 0)
+    assert(tc.run_loader(tc.free_agents_cache_file('C'), None,
+                         lambda: []) == fa[3:])
+    assert(tc.load_free_agents('C', None, lambda: []) == fa[3:])
+
+
+def test_league_cache_is_shared_by_teams(cfg):
+    lc = utils.LeagueCache(cfg)
+    fn = lc.league_lineup_file()
+    lc.register_team('1.l.1.t.1')
+    utils.LeagueCache(cfg).register_team('1.l.1.t.2')
+    lc.load_league_lineup(None, lambda: 'lineups')
+    assert(utils.LeagueCache(cfg).load_league_lineup(
+        None, lambda: 'rebuilt') == 'lineups')
+    lc.remove('1.l.1.t.1')
+    assert(lc.teams() == ['1.l.1.t.2'])
+    assert(os.path.exists(fn))
+    lc.remove('1.l.1.t.2')
+    assert(lc.teams() == [])
+    assert(not os.path.exists(fn))
+
+
+def test_league_cache_reset(cfg):
+    lc = utils.LeagueCache(cfg)
+    lc.register_team('1.l.1.t.1')
+    lc.register_team('1.l.1.t.2')
+    lc.load_prediction_builder(None, lambda: 'old source')
+    lc.load_schedule(None, lambda: 'schedule')
+    # A reset by one team leaves the shared files for the other team, but
+    # they are rebuilt the next time they are used.  The team then registers
+    # itself again.
+    lc.reset('1.l.1.t.1')
+    lc.register_team('1.l.1.t.1')
+    assert(lc.teams() == ['1.l.1.t.2', '1.l.1.t.1'])
+    assert(os.path.exists(lc.prediction_builder_file()))
+    assert(os.path.exists(lc.schedule_file()))
+    assert(lc.load_prediction_builder(None, lambda: 'new source') ==
+           'new source')
+    assert(lc.load_prediction_builder(None, lambda: 'newer source') ==
+           'new source')
+    # The last team to reset removes the files
+    lc.reset('1.l.1.t.1')
+    lc.reset('1.l.1.t.2')
+    assert(lc.teams() == [])
+    assert(not os.path.exists(lc.prediction_builder_file()))
+
+
+def test_cache_stats(cfg, monkeypatch):
+    monkeypatch.setattr(utils, 'cache_stats', utils.CacheStats())
+    lc = utils.LeagueCache(cfg)
+    fn = lc.league_lineup_file()
+    lc.run_loader(fn, None, lambda: 'lineups')
+    lc.run_loader(fn, None, lambda: 'lineups')
+    entry = utils.cache_stats.summary()['lg_lineups.pkl']
+    assert(entry['misses'] == 1)
+    assert(entry['builds'] == 1)
+    assert(entry['hits'] == 1)
+    assert(entry['bytes'] == os.path.getsize(fn))
+    report = utils.cache_report(cfg['Cache']['dir'])
+    assert([r['file'] for r in report] == ['1.l.1/lg_lineups.pkl'])
+
+
+def test_cache_stats_per_run(cfg, tmpdir):
+    stats = [utils.CacheStats(), utils.CacheStats()]
+    for s in stats:
+        lc = utils.LeagueCache(cfg, s)
+        lc.run_loader(lc.league_lineup_file(), None, lambda: 'lineups')
+    assert(stats[0].summary()['lg_lineups.pkl']['misses'] == 1)
+    assert(stats[1].summary()['lg_lineups.pkl']['misses'] == 0)
+    assert(stats[1].summary()['lg_lineups.pkl']['hits'] == 1)
+    fn = str(tmpdir.join("stats.json"))
+    stats[1].write_json(fn)
+    with open(fn) as f:
+        assert(json.load(f)['lg_lineups.pkl']['hits'] == 1)
+
+
+def test_name_index():
+    idx = utils.NameIndex(['José Ramírez', 'J.D. Martinez', 'Will Smith',
+                           'Will Smith', 'Vladimir Guerrero Jr.', np.nan],
+                          [1, 2, 3, 4, 5, 6])
+    assert(idx.unique('Jose Ramirez') == 1)
+    assert(idx.unique('JD Martinez') == 2)
+    assert(idx.unique('Vladimir Guerrero Jr. (Batter)') == 5)
+    assert(idx.unique('Will Smith') is None)
+    assert(idx.is_ambiguous('will smith'))
+    assert(idx.candidates('Nobody') == [])
+
+
+def test_lru_cache():
+    lru = utils.LRUCache(maxsize=2)
+    calls = []
+
+    def gen(v):
+        return lambda: calls.append(v) or v
+
+    assert(lru.memoize('a', gen(1)) == 1)
+    assert(lru.memoize('b', gen(2)) == 2)
+    assert(lru.memoize('a', gen(3)) == 1)
+    # 'b' is the least recently used so is evicted
+    assert(lru.memoize('c', gen(4)) == 4)
+    assert(lru.memoize('b', gen(5)) == 5)
+    assert(calls == [1, 2, 4, 5])
+    assert(lru.stats() == {'hits': 1, 'misses': 4, 'size': 2})
+
+
+def test_sport_caches():
+    shared = utils.SportCaches()
+    calls = []
+
+    def build(value):
+        calls.append(value)
+        return value
+
+    key = ('mlb', '2020', 'csv')
+    assert(shared.memoize(key, 'schedule', lambda: build('a')) == 'a')
+    assert(shared.memoize(key, 'schedule', lambda: build('b')) == 'a')
+    assert(shared.memoize(('nhl', '2020', 'csv'), 'schedule',
+                          lambda: build('c')) == 'c')
+    # An entry is built again once it is older than its max_age
+    old = datetime.timedelta(seconds=-1)
+    assert(shared.memoize(key, 'teams', lambda: build('d'), old) == 'd')
+    assert(shared.memoize(key, 'teams', lambda: build('e'), old) == 'e')
+    assert(calls == ['a', 'c', 'd', 'e'])
+
+
+def test_opponent_summary(cfg):
+    lc = utils.LeagueCache(cfg)
+    expiry = datetime.timedelta(minutes=10)
+    fp = utils.roster_fingerprint([3, 1, 2])
+    assert(lc.load_opponent_summary('1.l.1.t.2', expiry, fp,
+                                    lambda: 'v1') == 'v1')
+    assert(lc.load_opponent_summary('1.l.1.t.2', expiry,
+                                    utils.roster_fingerprint([1, 2, 3]),
+                                    lambda: 'v2') == 'v1')
+    assert(lc.load_opponent_summary('1.l.1.t.2', expiry,
+                                    utils.roster_fingerprint([1, 2, 4]),
+                                    lambda: 'v3') == 'v3')
+    lc.remove('1.l.1.t.1')
+    assert(not os.path.exists(lc.opponent_summary_file('1.l.1.t.2')))
+
+
+def test_opponent_summary_expiry(cfg):
+    lc = utils.LeagueCache(cfg)
+    expiry = datetime.timedelta(minutes=10)
+    lc.load_opponent_summary('1.l.1.t.2', expiry, 'fp', lambda: 'v1')
+    lc.load_opponent_summary('1.l.1.t.3', expiry, 'fp', lambda: 'v1')
+    old = time.time() - 3600
+    os.utime(lc.opponent_summary_file('1.l.1.t.2'), (old, old))
+    assert(lc.load_opponent_summary('1.l.1.t.3', expiry, 'fp',
+                                    lambda: 'v2') == 'v1')
+    # The summary of the old opponent is pruned
+    assert(not os.path.exists(lc.opponent_summary_file('1.l.1.t.2')))
+    assert(lc.load_opponent_summary('1.l.1.t.3', datetime.timedelta(0),
+                                    'fp', lambda: 'v2') == 'v2')
+
+
+def test_column_frame_round_trip(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.prediction_builder_file()
+    df = pd.DataFrame({'player_id': [1, 2, 3],
+                       'HR': [10.0, np.nan, 30.0],
+                       'Team': ['TOR', np.nan, 'SEA']},
+                      index=pd.Index(['A', 'B', 'C'], name='Name'))
+    tc.load_prediction_builder(None, lambda: {'pool': utils.ColumnFrame(df)})
+    cf = tc.load_prediction_builder(None, lambda: None)['pool']
+    assert(cf.path is not None)
+    assert(len(cf) == 3)
+    assert(cf.columns == ['player_id', 'HR', 'Team'])
+    assert(isinstance(cf.column('HR'), np.memmap))
+    sel = cf.where_in('player_id', [1, 3], columns=['HR'])
+    assert(sel.columns.to_list() == ['HR'])
+    assert(sel.index.to_list() == ['A', 'C'])
+    assert(sel['HR'].to_list() == [10.0, 30.0])
+    assert(cf.where_in('Name', ['B'])['player_id'].to_list() == [2])
+    assert(cf.take('player_id', [3, 1])['HR'].to_list() == [30.0, 10.0])
+    assert(cf.take('Name', ['B']).index.to_list() == ['B'])
+    with pytest.raises(KeyError):
+        cf.take('player_id', [4])
+    pd.testing.assert_frame_equal(cf.to_frame(), df, check_dtype=False)
+
+
+def test_column_frame_dtypes(cfg):
+    tc = utils.LeagueCache(cfg)
+    df = pd.DataFrame({'pos': pd.Categorical(['C', 'LW', 'C'],
+                                             categories=['LW', 'C']),
+                       'when': pd.date_range('2020-01-01', periods=3,
+                                             tz='US/Eastern'),
+                       'day': pd.date_range('2020-01-01', periods=3),
+                       'G': [1, 2, 3]},
+                      index=pd.Index(['a', 'b', 'c']))
+    tc.load_prediction_builder(None, lambda: utils.ColumnFrame(df))
+    cf = tc.load_prediction_builder(None, lambda: None)
+    # Nothing but the metadata is read when the frame is opened
+    assert(cf.loaded == {})
+    assert([c['dtype'] for c in cf.meta['columns']] ==
+           [str(dt) for dt in df.dtypes])
+    pd.testing.assert_frame_equal(cf.to_frame(), df)
+    assert(cf.where_in('pos', ['LW']).index.to_list() == ['b'])
+
+
+def test_column_frame_dir_kept_while_open(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.prediction_builder_file()
+    df = pd.DataFrame({'name': ['A', 'B']})
+    tc.load_prediction_builder(datetime.timedelta(minutes=-1),
+                               lambda: utils.ColumnFrame(df),
+                               grace=datetime.timedelta(minutes=10))
+    cf = tc.load_prediction_builder(datetime.timedelta(minutes=10),
+                                    lambda: utils.ColumnFrame(df))
+    tc.wait_for_refreshes()
+    assert(len(glob.glob(fn + ".cols.*")) == 2)
+    assert(cf.column('name').tolist() == ['A', 'B'])
+    del cf
+    tc.update(fn, lambda cf: utils.ColumnFrame(df))
+    assert(len(glob.glob(fn + ".cols.*")) == 1)
+
+
+@pytest.mark.skipif(utils.fcntl is None, reason="needs file locks")
+def test_column_frame_dir_kept_for_other_processes(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.prediction_builder_file()
+    df = pd.DataFrame({'name': ['A', 'B']})
+    cf = tc.load_prediction_builder(None, lambda: utils.ColumnFrame(df))
+    code = ("import configparser, pandas as pd\n"
+            "from yahoo_fantasy_bot import utils\n"
+            "c = configparser.RawConfigParser()\n"
+            "c['Cache'] = {{'dir': {!r}}}\n"
+            "c['League'] = {{'id': '1.l.1'}}\n"
+            "tc = utils.LeagueCache(c)\n"
+            "fn = tc.prediction_builder_file()\n"
+            "tc.update(fn, lambda cf: utils.ColumnFrame(pd.DataFrame()))\n"
+            "tc.remove_file(fn)\n").format(cfg['Cache']['dir'])
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert(not os.path.exists(fn))
+    assert(cf.column('name').tolist() == ['A', 'B'])
+    del cf
+    tc.remove_file(fn)
+    assert(len(glob.glob(fn + ".cols.*")) == 0)
+
+
+def test_column_frame_dirs_replaced(cfg):
+    tc = utils.LeagueCache(cfg)
+    fn = tc.prediction_builder_file()
+    df = pd.DataFrame({'player_id': [1, 2]})
+    tc.load_prediction_builder(datetime.timedelta(minutes=-1),
+                               lambda: utils.ColumnFrame(df))
+    tc.load_prediction_builder(None, lambda: utils.ColumnFrame(df))
+    assert(len(glob.glob(fn + ".cols.*")) == 1)
+    tc.remove('1.l.1.t.1')
+    assert(len(glob.glob(fn + ".cols.*")) == 0)
@@ -1,10 +1,47 @@
 #!/usr/bin/python
 
+import bz2
+import collections
+import contextlib
 import unicodedata
+import glob
+import gzip
+import hashlib
+import lzma
 import os
 import logging
 import pickle
+import re
 import datetime
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import numpy as np
+import pandas as pd
+from yahoo_fantasy_bot import cache_files
+try:
+    import fcntl
+except ImportError:
+    # Advisory file locks are not available on Windows
+    fcntl = None
+
+
+# Version of the layout of the cache files.  Bump this whenever a change is
+# made to the objects that are cached so that old files are rebuilt.
+CACHE_VERSION = 7
+
+# Compression that can be used for the cache files.  Maps the name used in the
+# config to the magic bytes at the start of a compressed file and the module
+# to compress with.
+COMPRESSORS = {'none': (None, None),
+               'gzip': (b'\x1f\x8b', gzip),
+               'bz2': (b'BZh', bz2),
+               'lzma': (b'\xfd7zXZ\x00', lzma)}
 
 
 def normalized(name):
@@ -19,80 +56,1095 @@ def normalized(name):
         'ascii', 'ignore').decode('utf-8')
 
 
+# Suffixes that are dropped from a name when it is used as a lookup key
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv'}
+
+
+def name_key(name):
+    """Return the key to use when looking up a player by name
+
+    The key is the normalized name in lower case, without any punctuation,
+    without a trailing qualifier in brackets (e.g. '(Batter)') and without a
+    suffix like Jr. or III.
+
+    :param name: Name of the player
+    :type name: str
+    :rtype: str
+    """
+    name = re.sub(r"\(.*\)\s*$", "", normalized(name)).lower()
+    name = re.sub(r"[.']", "", name)
+    words = re.sub(r"[^a-z0-9 ]", " ", name).split()
+    while len(words) > 1 and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class NameIndex(object):
+    """Hash index to lookup values by a player's name
+
+    The names are indexed by their name_key(), so lookups ignore accents,
+    case, punctuation and suffixes.  A name is ambiguous if it leads to more
+    than one distinct value.
+
+    :param names: Names to index
+    :type names: list(str)
+    :param values: Value to return for each of the names
+    :type values: list
+    """
+    def __init__(self, names, values):
+        self.index = {}
+        for name, value in zip(names, values):
+            if type(name) is not str:
+                continue
+            candidates = self.index.setdefault(name_key(name), [])
+            if value not in candidates:
+                candidates.append(value)
+
+    def candidates(self, name):
+        """Return all of the values that match a name
+
+        :rtype: list
+        """
+        return self.index.get(name_key(name), [])
+
+    def unique(self, name):
+        """Return the value for a name, or None if it is missing or ambiguous
+        """
+        candidates = self.candidates(name)
+        return candidates[0] if len(candidates) == 1 else None
+
+    def is_ambiguous(self, name):
+        return len(self.candidates(name)) > 1
+
+
+def fingerprint(cfg, sections, files, contents=False):
+    """Compute a fingerprint of the inputs that a cache entry is built from
+
+    :param cfg: Loaded config object
+    :type cfg: configparser.ConfigParser
+    :param sections: Config sections whose settings are included
+    :type sections: list(str)
+    :param files: Input files that are included
+    :type files: list(str)
+    :param contents: If True, the contents of the files are hashed.
+        Otherwise just their modification time and size are used.
+    :type contents: bool
+    :return: Hex digest that changes whenever one of the inputs changes
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    for section in sections:
+        if section in cfg:
+            for (k, v) in sorted(cfg[section].items()):
+                h.update("[{}]{}={}\n".format(section, k, v).encode())
+    for fn in files:
+        h.update("{}\n".format(fn).encode())
+        try:
+            if contents:
+                with open(fn, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        h.update(chunk)
+            else:
+                st = os.stat(fn)
+                h.update("{}:{}\n".format(st.st_mtime_ns,
+                                           st.st_size).encode())
+        except FileNotFoundError:
+            h.update(b"missing\n")
+    return h.hexdigest()
+
+
+def roster_fingerprint(plyr_ids):
+    """Return a short fingerprint of the players on a roster
+
+    The order of the players doesn't matter.
+
+    :param plyr_ids: Yahoo! IDs of the players
+    :type plyr_ids: list(int)
+    :rtype: str
+    """
+    ids = ",".join(str(int(i)) for i in sorted(plyr_ids))
+    return hashlib.sha1(ids.encode()).hexdigest()[:16]
+
+
+class CacheStats(object):
+    """Counters and timings of the cache entries used during a run
+
+    The entries are keyed by their file name without the directory, so that
+    the same entry for different teams is counted together.
+    """
+    COUNTERS = ["hits", "stale", "misses", "loads", "builds"]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def record(self, fn, event, secs=None, size=None):
+        """Record an event for a cache entry
+
+        :param fn: Name of the cache file
+        :param event: One of the COUNTERS
+        :param secs: How long the event took
+        :param size: Size of the file in bytes
+        """
+        name = os.path.basename(fn)
+        with self.lock:
+            if name not in self.entries:
+                self.entries[name] = dict.fromkeys(self.COUNTERS, 0)
+                self.entries[name].update({"load_secs": 0.0,
+                                           "build_secs": 0.0, "bytes": None})
+            entry = self.entries[name]
+            entry[event] += 1
+            if secs is not None:
+                entry["{}_secs".format(event[:-1])] += secs
+            if size is not None:
+                entry["bytes"] = size
+
+    def summary(self):
+        """Return a copy of the stats of each entry
+
+        :rtype: dict(str, dict)
+        """
+        with self.lock:
+            return {k: dict(v) for k, v in self.entries.items()}
+
+    def log(self, logger):
+        for name, entry in sorted(self.summary().items()):
+            logger.info(
+                "Cache {}: {} hits, {} stale, {} misses, {} loads in {:.3f}s, "
+                "{} builds in {:.3f}s, {} bytes".format(
+                    name, entry["hits"], entry["stale"], entry["misses"],
+                    entry["loads"], entry["load_secs"], entry["builds"],
+                    entry["build_secs"], entry["bytes"]))
+
+    def write_json(self, fn):
+        """Write the stats out as JSON
+
+        The file is replaced atomically so that a reader never sees it half
+        written.
+        """
+        (fd, tmp_fn) = tempfile.mkstemp(dir=os.path.dirname(fn) or ".",
+                                        prefix=".tmp.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.summary(), f, indent=2, sort_keys=True)
+        os.replace(tmp_fn, fn)
+
+
+# Stats of the caches that aren't given their own CacheStats
+cache_stats = CacheStats()
+
+# The report is kept in a module of its own so that it can be printed
+# without importing pandas
+cache_report = cache_files.report
+
+# ColumnFrames that were opened from a cache file and are still in use.  The
+# directories they read from are kept when the cache file is rebuilt.  This is
+# only needed where there are no file locks; otherwise each open frame holds a
+# shared lock on its directory, which protects it from other processes too.
+_open_column_frames = weakref.WeakSet()
+
+
+class LRUCache(object):
+    """Bounded in-memory cache that evicts the least recently used entry
+
+    It keeps count of the hits and misses so that callers can tell how well
+    it is working.  It can be shared by threads.  Two threads that miss on the
+    same key at the same time both call func.
+
+    :param maxsize: Most number of entries to keep
+    :type maxsize: int
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def memoize(self, key, func):
+        """Return the cached value for a key, calling func on a miss
+
+        :param key: Hashable key of the entry
+        :param func: Function that produces the value for the key
+        :return: The value for the key
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+        value = func()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        """Return the hit and miss counts
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self.entries)}
+
+
+class SportCaches(object):
+    """In-memory state that the leagues of one sport share within a process
+
+    A process that manages many leagues keeps one of these, so that a league
+    reuses the projections, schedules and scraped data that another league
+    of the same sport and season already loaded.  Each entry is keyed by the
+    sport key (e.g. game code, season and prediction source) and a name.
+
+    Entries are built once even when many threads ask for them at the same
+    time.  An entry older than the max_age it was asked for with is built
+    again.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.build_locks = {}
+
+    def memoize(self, key, name, func, max_age=None):
+        """Return a shared entry, calling func if it is missing or too old
+
+        :param key: Hashable key of the sport
+        :param name: Name of the entry
+        :type name: str
+        :param func: Function that produces the value of the entry
+        :param max_age: How long the value can be used for.  None means it
+            can be used for as long as the process runs.
+        :type max_age: datetime.timedelta
+        :return: The value of the entry
+        """
+        with self.lock:
+            self._prune()
+            build_lock = self.build_locks.setdefault((key, name),
+                                                     threading.Lock())
+        with build_lock:
+            with self.lock:
+                entry = self.entries.get((key, name))
+            if entry is not None and not self._is_old(entry):
+                return entry[2]
+            value = func()
+            with self.lock:
+                self.entries[(key, name)] = (time.monotonic(), max_age,
+                                             value)
+            return value
+
+    def _is_old(self, entry):
+        (created, max_age, _) = entry
+        return max_age is not None and \
+            time.monotonic() - created > max_age.total_seconds()
+
+    def _prune(self):
+        """Let go of the entries that are too old to be used"""
+        for k in [k for k, e in self.entries.items() if self._is_old(e)]:
+            del self.entries[k]
+
+
+class ColumnFrame(object):
+    """A DataFrame that can be stored column by column on disk.
+
+    When a ColumnFrame is written as part of a cache file, each column is
+    saved to its own file next to the cache file.  Nothing but the metadata
+    is read when the frame is opened.  Numeric columns are memory mapped the
+    first time they are used, and other columns are unpickled the first
+    time they are asked for.  This lets a caller load just the columns and
+    rows it needs out of a large frame.
+
+    :param df: Frame to wrap
+    :type df: DataFrame
+    """
+    META_FILE = "meta.json"
+
+    def __init__(self, df):
+        self.df = df
+        self.path = None
+        self.meta = None
+        self.loaded = {}
+        self.positions = {}
+
+    @classmethod
+    def open(cls, path):
+        """Open a ColumnFrame that was saved with save()
+
+        While the frame is alive it holds a shared lock on the directory of
+        the cache file's columns, so that a later build of the cache file,
+        in this process or any other, doesn't remove them.
+
+        :param path: Directory the frame was saved to
+        :return: ColumnFrame whose columns are read on demand
+        :raises FileNotFoundError: If the directory has been removed
+        """
+        cf = cls(None)
+        cf.path = path
+        if fcntl is not None:
+            fd = os.open(os.path.dirname(path), os.O_RDONLY)
+            weakref.finalize(cf, os.close, fd)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+        else:
+            _open_column_frames.add(cf)
+        with open(os.path.join(path, cls.META_FILE)) as f:
+            cf.meta = json.load(f)
+        return cf
+
+    def save(self, path):
+        """Save each column of the frame to its own file in a directory
+
+        The metadata records the dtype of each column and the index, named or
+        not, unless it is the default one.
+
+        :param path: Directory to save to.  It must not yet exist.
+        """
+        df = self.to_frame()
+        os.makedirs(path)
+        meta = {"length": len(df.index), "index": None, "columns": []}
+        cols = [(name, df[name], False) for name in df.columns]
+        if not df.index.equals(pd.RangeIndex(len(df.index))):
+            cols.append((df.index.name, df.index.to_series(), True))
+        for i, (name, col, is_index) in enumerate(cols):
+            if isinstance(col.dtype, np.dtype) and \
+                    col.dtype.kind in 'biufmM':
+                fn = "{}.npy".format(i)
+                np.save(os.path.join(path, fn), col.to_numpy())
+                kind = "numeric"
+            else:
+                # Extension arrays (categoricals, datetimes with a time zone,
+                # etc.) are pickled as is to keep their dtype
+                fn = "{}.pkl".format(i)
+                vals = col.to_numpy() if col.dtype == object else col.array
+                with open(os.path.join(path, fn), "wb") as f:
+                    pickle.dump(vals, f, protocol=pickle.HIGHEST_PROTOCOL)
+                kind = "object"
+            entry = {"name": name, "file": fn, "kind": kind,
+                     "dtype": str(col.dtype)}
+            if is_index:
+                meta["index"] = entry
+            else:
+                meta["columns"].append(entry)
+        with open(os.path.join(path, self.META_FILE), "w") as f:
+            json.dump(meta, f)
+
+    @property
+    def columns(self):
+        if self.df is not None:
+            return self.df.columns.to_list()
+        return [c["name"] for c in self.meta["columns"]]
+
+    @property
+    def index_name(self):
+        if self.df is not None:
+            return self.df.index.name
+        return self.meta["index"]["name"] if self.meta["index"] else None
+
+    def __len__(self):
+        if self.df is not None:
+            return len(self.df.index)
+        return self.meta["length"]
+
+    def column(self, name):
+        """Return the values of a single column (or the index)
+
+        :param name: Name of the column or of the index
+        :rtype: numpy.ndarray or pandas.api.extensions.ExtensionArray
+        """
+        if self.df is not None:
+            if name not in self.df.columns and name == self.df.index.name:
+                vals = self.df.index
+            else:
+                vals = self.df[name]
+            return vals.to_numpy() if isinstance(vals.dtype, np.dtype) \
+                else vals.array
+        for col in self.meta["columns"]:
+            if col["name"] == name:
+                return self._read_column(col)
+        if self.meta["index"] is not None and name == self.index_name:
+            return self._read_column(self.meta["index"])
+        raise KeyError(name)
+
+    def _read_column(self, col):
+        """Read in a column the first time it is used"""
+        if col["file"] not in self.loaded:
+            fn = os.path.join(self.path, col["file"])
+            if col["kind"] == "numeric":
+                self.loaded[col["file"]] = np.load(fn, mmap_mode='r')
+            else:
+                with open(fn, "rb") as f:
+                    self.loaded[col["file"]] = pickle.load(f)
+        return self.loaded[col["file"]]
+
+    def load(self, columns=None, rows=None):
+        """Build a DataFrame out of some of the columns and rows
+
+        :param columns: Columns to include.  Default is all of them.
+        :type columns: list(str)
+        :param rows: Boolean mask or positions of the rows to include.
+            Default is all of them.
+        :return: The projected frame
+        :rtype: DataFrame
+        """
+        if columns is None:
+            columns = self.columns
+        if self.df is not None:
+            df = self.df[columns]
+            return df if rows is None else df.iloc[rows]
+
+        def select(vals):
+            vals = vals if rows is None else vals[rows]
+            # Copy out of the memory map
+            return np.array(vals) if isinstance(vals, np.ndarray) else vals
+
+        data = {name: select(self.column(name)) for name in columns}
+        index = None
+        if self.meta["index"] is not None:
+            index = pd.Index(select(self._read_column(self.meta["index"])),
+                             name=self.index_name)
+        return pd.DataFrame(data, index=index, columns=columns)
+
+    def where_in(self, name, values, columns=None):
+        """Return the rows whose value for a column is in a list of values
+
+        Only the key column is read in full.  The other columns are read for
+        the matching rows.
+
+        :param name: Column (or index) to match on
+        :param values: Values to look for
+        :param columns: Columns to include.  Default is all of them.
+        :rtype: DataFrame
+        """
+        mask = pd.Series(self.column(name)).isin(values).to_numpy()
+        return self.load(columns, np.flatnonzero(mask))
+
+    def take(self, name, values, columns=None):
+        """Return the rows for a list of key values, in the same order
+
+        The first time a column is used as a key, a hash index of it is
+        built.  Each value gets the first row that has it.
+
+        :param name: Column (or index) to match on
+        :param values: Values to look for.  Each must be in the column.
+        :param columns: Columns to include.  Default is all of them.
+        :rtype: DataFrame
+        """
+        if name not in self.positions:
+            keys = self.column(name)
+            pos = pd.Series(np.arange(len(keys)), index=keys)
+            self.positions[name] = pos[~pos.index.duplicated()]
+        rows = self.positions[name].reindex(values)
+        if rows.isna().any():
+            raise KeyError("Values not found in {}: {}".format(
+                name, rows.index[rows.isna()].to_list()))
+        return self.load(columns, rows.to_numpy(dtype=np.int64))
+
+    def to_frame(self):
+        """Return the whole frame"""
+        if self.df is None:
+            return self.load()
+        return self.df
+
+    def __getstate__(self):
+        # A plain pickle of a ColumnFrame holds the entire frame.  Cache files
+        # store the columns separately; see CacheBase.
+        return self.to_frame()
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+
 class CacheBase(object):
-    def __init__(self, cfg, cache_dir):
+    """Base class for the cache files.
+
+    Each cache file holds a single payload along with its expiry and the
+    version of the cache format.  These are pickled in a small header ahead
+    of the payload, so that the expiry of a file can be checked without
+    reading in its payload.  Files are written atomically, and building a
+    file is done while holding an advisory lock so that concurrent processes
+    that need the same file only build it once.
+
+    :param cfg: Loaded config object
+    :type cfg: configparser.ConfigParser
+    :param cache_dir: Directory to keep the cache files in
+    :type cache_dir: str
+    :param stats: Stats to record the use of the cache in.  Defaults to the
+        module wide cache_stats.
+    :type stats: CacheStats
+    """
+    def __init__(self, cfg, cache_dir, stats=None):
         self.logger = logging.getLogger()
         self.cfg = cfg
         self.cache_dir = cache_dir
+        self.stats = cache_stats if stats is None else stats
+        self.refreshes = {}
+        self.compression = cfg['Cache'].get('compression', 'none')
+        if self.compression not in COMPRESSORS:
+            raise RuntimeError("Unknown cache compression: {}".format(
+                self.compression))
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
 
-    def run_loader(self, fn, expiry, loader):
-        cached_data = None
+    def is_fresh(self, fn):
+        """Check if a cache file exists and has not yet expired
 
-        if os.path.exists(fn):
-            with open(fn, "rb") as f:
-                cached_data = pickle.load(f)
-            if type(cached_data) != dict or "expiry" not in cached_data or \
-                    "payload" not in cached_data:
+        :param fn: Name of the cache file
+        :return: True if the cache file can be used as is
+        :rtype: bool
+        """
+        header = self._read_header(fn)
+        return header is not None and not self._is_expired(header)
+
+    def is_usable(self, fn):
+        """Check if a cache file can be served without rebuilding it first
+
+        This is true for fresh files as well as for files that are stale but
+        have not yet passed their hard expiry.
+
+        :param fn: Name of the cache file
+        :rtype: bool
+        """
+        header = self._read_header(fn)
+        return header is not None and not self._is_hard_expired(header)
+
+    def run_loader(self, fn, expiry, loader, grace=None, fingerprint=None,
+                   isolated_loader=None):
+        """Return the payload of a cache file, building it if needed
+
+        A file is stale once expiry has passed.  For the grace period after
+        that the stale payload is still returned, but the file is rebuilt in a
+        background thread so that the next use of it is fresh.  Once the
+        grace period is over the file is rebuilt before returning.
+
+        A file is also rebuilt before returning if it was built from inputs
+        with a different fingerprint.
+
+        :param fn: Name of the cache file
+        :param expiry: How long a newly built file is valid for.  None means it
+            never expires.
+        :type expiry: datetime.timedelta
+        :param loader: Function that builds the payload
+        :param grace: How long a stale file can still be served for.  None
+            means the file must be rebuilt as soon as it expires.
+        :type grace: datetime.timedelta
+        :param fingerprint: Fingerprint of the inputs the payload is built
+            from.  See utils.fingerprint().
+        :type fingerprint: str
+        :param isolated_loader: Function that builds the payload without
+            sharing any state with the caller.  The background refresh uses
+            it so that it doesn't race with the caller.  Defaults to loader.
+        :return: The payload
+        """
+        return self._load(fn, expiry, loader, grace, fingerprint,
+                          isolated_loader)["payload"]
+
+    def _load(self, fn, expiry, loader, grace, fingerprint, isolated_loader):
+        """Same as run_loader() but returns the whole cache file contents"""
+        cached_data = self._read(fn)
+        if self._is_servable(cached_data, fingerprint):
+            if self._is_expired(cached_data):
+                self.stats.record(fn, "stale")
+                self._refresh_in_background(fn, expiry,
+                                            isolated_loader or loader,
+                                            grace, fingerprint)
+            else:
+                self.stats.record(fn, "hits")
+            return cached_data
+
+        with self._lock(fn):
+            # Another process may have built the file while we waited for
+            # the lock.
+            cached_data = self._read(fn)
+            if cached_data is not None:
+                if self._is_servable(cached_data, fingerprint):
+                    self.stats.record(fn, "hits")
+                    return cached_data
+                if self._is_hard_expired(cached_data):
+                    self.logger.info("{} file is stale.  Expired at {}".
+                                     format(fn, cached_data["expiry"]))
+                else:
+                    self.logger.info("{} file is stale.  Its inputs have "
+                                     "changed".format(fn))
+                # Let go of its column frames so that their directories are
+                # removed by the build
                 cached_data = None
-            elif cached_data["expiry"] is not None:
-                if datetime.datetime.now() > cached_data["expiry"]:
-                    self.logger.info(
-                        "{} file is stale.  Expired at {}".
-                        format(fn, cached_data["expiry"]))
-                    cached_data = None
-
-        if cached_data is None:
-            self.logger.info("Building new {} file".format(fn))
-            cached_data = {}
-            cached_data["payload"] = loader()
-            if expiry is not None:
-                cached_data["expiry"] = datetime.datetime.now() + expiry
+            self.stats.record(fn, "misses")
+            return self._build(fn, expiry, loader, grace, fingerprint)
+
+    def wait_for_refreshes(self, timeout=None):
+        """Block until all of the background refreshes have finished
+
+        :param timeout: Most seconds to wait for in total.  None waits for as
+            long as it takes.
+        :type timeout: float
+        :return: True if all of the refreshes finished
+        :rtype: bool
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in list(self.refreshes.values()):
+            if deadline is None:
+                t.join()
             else:
-                cached_data["expiry"] = None
-            with open(fn, "wb") as f:
-                pickle.dump(cached_data, f)
-            self.logger.info("Finished building {} file".format(fn))
+                t.join(max(0, deadline - time.monotonic()))
+        return not any(t.is_alive() for t in self.refreshes.values())
+
+    def update(self, fn, func):
+        """Modify the payload of an existing cache file
+
+        The expiry of the file is left as is.  Nothing is done if the file
+        doesn't exist.
+
+        :param fn: Name of the cache file
+        :param func: Function that is passed the current payload and returns
+            the new payload
+        """
+        with self._lock(fn):
+            cached_data = self._read(fn)
+            if cached_data is None:
+                return
+            cached_data["payload"] = func(cached_data["payload"])
+            self._write(fn, cached_data)
+
+    def remove_file(self, fn):
+        with self._lock(fn):
+            if os.path.exists(fn):
+                os.remove(fn)
+            self._remove_column_dirs(fn)
+
+    def _is_expired(self, cached_data):
+        return cached_data["expiry"] is not None and \
+            datetime.datetime.now() > cached_data["expiry"]
+
+    def _is_hard_expired(self, cached_data):
+        hard_expiry = cached_data.get("hard_expiry", cached_data["expiry"])
+        return hard_expiry is not None and \
+            datetime.datetime.now() > hard_expiry
+
+    def _is_servable(self, cached_data, fingerprint):
+        return cached_data is not None and \
+            not self._is_hard_expired(cached_data) and \
+            cached_data.get("fingerprint") == fingerprint
+
+    def _build(self, fn, expiry, loader, grace, fingerprint=None):
+        """Build and write out a new cache file
+
+        Must be called with the lock for the file held.
+        """
+        self.logger.info("Building new {} file".format(fn))
+        start = time.perf_counter()
+        # Anything that changes after this point may be missing from the
+        # payload
+        built = time.time()
+        cached_data = {"version": CACHE_VERSION,
+                       "fingerprint": fingerprint,
+                       "payload": loader(),
+                       "built": built}
+        if expiry is not None:
+            cached_data["expiry"] = datetime.datetime.now() + expiry
+            cached_data["hard_expiry"] = cached_data["expiry"]
+            if grace is not None:
+                cached_data["hard_expiry"] += grace
+        else:
+            cached_data["expiry"] = None
+            cached_data["hard_expiry"] = None
+        self._write(fn, cached_data)
+        self.stats.record(fn, "builds", secs=time.perf_counter() - start,
+                           size=os.path.getsize(fn))
+        self.logger.info("Finished building {} file".format(fn))
+        return cached_data
+
+    def _refresh_in_background(self, fn, expiry, loader, grace,
+                               fingerprint):
+        """Start a thread that rebuilds a stale cache file
+
+        The thread is a daemon so that a slow refresh doesn't keep the program
+        alive.  Use wait_for_refreshes() to give it a chance to finish.  The
+        new file is only swapped in once it is fully built.
+        """
+        t = self.refreshes.get(fn)
+        if t is not None and t.is_alive():
+            return
+        self.logger.info("Serving stale {} file.  Refreshing it in the "
+                         "background".format(fn))
+        t = threading.Thread(target=self._refresh,
+                             args=(fn, expiry, loader, grace, fingerprint),
+                             name="cache-refresh", daemon=True)
+        self.refreshes[fn] = t
+        t.start()
+
+    def _refresh(self, fn, expiry, loader, grace, fingerprint):
+        try:
+            with self._lock(fn):
+                # Someone else may have refreshed it already
+                header = self._read_header(fn)
+                if self._is_servable(header, fingerprint) and \
+                        not self._is_expired(header):
+                    self.logger.info("{} file was already refreshed".
+                                     format(fn))
+                    return
+                self._build(fn, expiry, loader, grace, fingerprint)
+            self.logger.info("Background refresh of {} file complete".
+                             format(fn))
+        except Exception as e:
+            self.logger.warning("Background refresh of {} file failed: {}".
+                                format(fn, e))
+
+    def _read(self, fn):
+        """Read a cache file
+
+        :return: The contents of the file.  None if the file doesn't exist, is
+            unreadable or was written by a different version of the cache.
+        :rtype: dict
+        """
+        start = time.perf_counter()
+        for _ in range(3):
+            try:
+                with open(fn, "rb") as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                return None
+            size = len(raw)
+            try:
+                for (magic, module) in COMPRESSORS.values():
+                    if magic is not None and raw.startswith(magic):
+                        raw = module.decompress(raw)
+                        break
+                buf = io.BytesIO(raw)
+                cached_data = pickle.load(buf)
+                if not self._is_current(fn, cached_data):
+                    return None
+                cached_data["payload"] = _ColumnUnpickler(
+                    buf, os.path.dirname(fn)).load()
+                break
+            except FileNotFoundError:
+                # The file was rebuilt by someone else after we read it and
+                # its old columns are gone.  The new file has its own.
+                continue
+            except Exception as e:
+                self.logger.warning("Ignoring unreadable cache file {}: {}".
+                                    format(fn, e))
+                return None
+        else:
+            self.logger.warning("Ignoring cache file {} whose columns keep "
+                                "being removed".format(fn))
+            return None
+        self.stats.record(fn, "loads", secs=time.perf_counter() - start,
+                           size=size)
+        return cached_data
+
+    def _read_header(self, fn):
+        """Read the header of a cache file without its payload
+
+        Only the start of a compressed file is decompressed.
+
+        :return: The contents of the file except for the payload.  None if
+            the file doesn't exist, is unreadable or was written by a
+            different version of the cache.
+        :rtype: dict
+        """
+        try:
+            with open(fn, "rb") as f:
+                start = f.read(8)
+                f.seek(0)
+                stream = f
+                for (magic, module) in COMPRESSORS.values():
+                    if magic is not None and start.startswith(magic):
+                        stream = module.open(f)
+                        break
+                header = pickle.load(stream)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning("Ignoring unreadable cache file {}: {}".
+                                format(fn, e))
+            return None
+        return header if self._is_current(fn, header) else None
+
+    def _is_current(self, fn, header):
+        """Check if a header was written by this version of the cache"""
+        if type(header) != dict or \
+                header.get("version") != CACHE_VERSION or \
+                "expiry" not in header:
+            self.logger.info("Ignoring cache file {} from a different version".
+                             format(fn))
+            return False
+        return True
+
+    def _write(self, fn, cached_data):
+        """Atomically write out a cache file
+
+        The data is written to a temporary file in the same directory and then
+        renamed over the old file.  Readers will see either the old or the new
+        file but never a partially written one.
+
+        The header, which is everything but the payload, is pickled first and
+        then the payload.  Any ColumnFrame in the payload is saved column by
+        column to a directory next to the cache file.  A new directory is used
+        for each write, and the old ones are removed once the new file is in
+        place.
+        """
+        cols_dir = "{}.cols.{}".format(fn, uuid.uuid4().hex[:8])
+        buf = io.BytesIO()
+        header = {k: v for k, v in cached_data.items() if k != "payload"}
+        pickle.dump(header, buf, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler = _ColumnPickler(buf, cols_dir)
+        pickler.dump(cached_data["payload"])
+        raw = buf.getvalue()
+        (_, module) = COMPRESSORS[self.compression]
+        if module is not None:
+            raw = module.compress(raw)
+        (fd, tmp_fn) = tempfile.mkstemp(dir=os.path.dirname(fn),
+                                        prefix=".tmp.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_fn, fn)
+        except BaseException:
+            os.remove(tmp_fn)
+            shutil.rmtree(cols_dir, ignore_errors=True)
+            raise
+        self._remove_column_dirs(fn, keep=cols_dir)
+
+    def _remove_column_dirs(self, fn, keep=None):
+        """Remove the column directories of a cache file
+
+        Directories that an open ColumnFrame, in any process, still reads from
+        are left for a later write or removal of the file to clean up.
+        Without file locks only the frames of this process are known, and
+        they are only kept when the file is rewritten (keep is not None).
+
+        Must be called with the lock for the file held.
+        """
+        if fcntl is None:
+            in_use = set()
+            if keep is not None:
+                in_use = {os.path.dirname(cf.path)
+                          for cf in list(_open_column_frames)}
+            for d in glob.glob("{}.cols.*".format(fn)):
+                if d != keep and d not in in_use:
+                    shutil.rmtree(d, ignore_errors=True)
+            return
+        for d in glob.glob("{}.cols.*".format(fn)):
+            if d == keep:
+                continue
+            try:
+                fd = os.open(d, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                shutil.rmtree(d, ignore_errors=True)
+            finally:
+                os.close(fd)
+
+    @contextlib.contextmanager
+    def _lock(self, fn):
+        """Hold an exclusive advisory lock for a cache file
+
+        The lock is taken on a separate .lock file so that it survives the
+        cache file being replaced.
+        """
+        with open(fn + ".lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _to_json(obj):
+    """Convert numpy values for json.dumps"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError("Cannot convert {} to JSON".format(type(obj)))
+
+
+class _ColumnPickler(pickle.Pickler):
+    """Pickler that saves any ColumnFrame out to its own directory"""
+    def __init__(self, f, cols_dir):
+        super(_ColumnPickler, self).__init__(
+            f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.cols_dir = cols_dir
+        self.num_frames = 0
+
+    def persistent_id(self, obj):
+        if isinstance(obj, ColumnFrame):
+            # Paths are stored relative to the cache directory
+            path = os.path.join(self.cols_dir, str(self.num_frames))
+            self.num_frames += 1
+            obj.save(path)
+            return ("ColumnFrame", os.path.relpath(
+                path, os.path.dirname(self.cols_dir)))
+        return None
+
+
+class _ColumnUnpickler(pickle.Unpickler):
+    """Unpickler that opens the ColumnFrames saved by _ColumnPickler"""
+    def __init__(self, f, cache_dir):
+        super(_ColumnUnpickler, self).__init__(f)
+        self.cache_dir = cache_dir
 
-        return cached_data["payload"]
+    def persistent_load(self, pid):
+        (type_tag, path) = pid
+        if type_tag != "ColumnFrame":
+            raise pickle.UnpicklingError("Unsupported persistent object")
+        return ColumnFrame.open(os.path.join(self.cache_dir, path))
 
 
 class TeamCache(CacheBase):
-    def __init__(self, cfg, team_key):
+    def __init__(self, cfg, team_key, stats=None):
         super(TeamCache, self).__init__(
             cfg, "{}/{}/{}".format(cfg['Cache']['dir'], cfg['League']['id'],
-                                   team_key))
+                                   team_key), stats)
+        self.journal = None
 
-    def prediction_builder_file(self):
-        return "{}/pred_builder.pkl".format(self.cache_dir)
+    def free_agents_cache_file(self, position):
+        return "{}/free_agents.{}.pkl".format(self.cache_dir, position)
 
-    def load_prediction_builder(self, expiry, loader):
-        return self.run_loader(self.prediction_builder_file(), expiry, loader)
+    def load_free_agents(self, position, expiry, loader, grace=None,
+                         isolated_loader=None):
+        """Load a free agent slice with the journaled roster moves applied
 
-    def league_lineup_file(self):
-        return "{}/lg_lineups.pkl".format(self.cache_dir)
+        :param position: Position of the slice
+        :param expiry: How long a newly built slice is valid for
+        :param loader: Function that downloads the slice
+        :param grace: How long a stale slice can still be served for
+        :param isolated_loader: Loader for the background refresh.  See
+            run_loader().
+        :return: Free agents for the position
+        :rtype: list(dict)
+        """
+        # The slice and the journal are read under the journal lock, so that
+        # a compaction can't fold the journal into the slice in between
+        with self._lock(self.free_agents_journal_file()):
+            cached_data = self._load(self.free_agents_cache_file(position),
+                                     expiry, loader, grace, None,
+                                     isolated_loader)
+            return self._apply_free_agents_journal(
+                cached_data["payload"], cached_data.get("built"))
+
+    def has_free_agents(self, position):
+        return self.is_usable(self.free_agents_cache_file(position))
+
+    def free_agents_journal_file(self):
+        return "{}/free_agents.journal".format(self.cache_dir)
+
+    def journal_free_agents(self, plyrs):
+        """Record players that are no longer free agents
+
+        The players are appended to a journal that is applied whenever a
+        slice is loaded, rather than rewriting the slices.  Each entry is
+        stamped with the time it was made, so that it isn't applied to slices
+        downloaded after it.  Once the journal gets long it is compacted into
+        the slices.
+
+        Players we drop are not journaled.  They go on waivers rather than
+        back to the free agents, so they don't belong in the slices until
+        they are downloaded again.
+
+        :param plyrs: Players that were added to a team
+        :type plyrs: list(dict)
+        """
+        entry = {'op': 'add', 'time': time.time(),
+                 'player_ids': [int(e['player_id']) for e in plyrs]}
+        fn = self.free_agents_journal_file()
+        with self._lock(fn):
+            with open(fn, "a") as f:
+                f.write(json.dumps(entry, default=_to_json) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            entries = self._read_free_agents_journal()
+            limit = self.cfg['Cache'].getint('freeAgentJournalCompactAt',
+                                             fallback=50)
+            if len(entries) >= limit:
+                self._compact_free_agents_journal(entries)
+
+    def _read_free_agents_journal(self):
+        fn = self.free_agents_journal_file()
+        try:
+            st = os.stat(fn)
+        except FileNotFoundError:
+            return []
+        key = (st.st_mtime_ns, st.st_size)
+        if self.journal is None or self.journal[0] != key:
+            with open(fn) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            self.journal = (key, entries)
+        return self.journal[1]
+
+    def _apply_free_agents_journal(self, fa, built, entries=None):
+        """Apply the journal entries made since a slice was built
+
+        Must be called with the journal lock held.
 
-    def load_league_lineup(self, expiry, loader):
-        return self.run_loader(self.league_lineup_file(), expiry, loader)
+        :param fa: Free agents in the slice
+        :param built: Time the slice was built.  None applies all entries.
+        :type built: float
+        :param entries: Journal entries.  Defaults to the journal on disk.
+        """
+        if entries is None:
+            entries = self._read_free_agents_journal()
+        if built is not None:
+            entries = [e for e in entries if e.get('time', built) >= built]
+        taken = {plyr_id for e in entries
+                 for plyr_id in e.get('player_ids', [])}
+        if len(taken) == 0:
+            return fa
+        return [e for e in fa if e['player_id'] not in taken]
 
-    def free_agents_cache_file(self):
-        return "{}/free_agents.pkl".format(self.cache_dir)
+    def _compact_free_agents_journal(self, entries):
+        """Fold the journal into each of the slices and then truncate it
 
-    def load_free_agents(self, expiry, loader):
-        return self.run_loader(self.free_agents_cache_file(), expiry, loader)
+        Must be called with the journal lock held.
+        """
+        self.logger.info("Compacting {} free agent journal entries".format(
+            len(entries)))
+        for fn in glob.glob("{}/free_agents.*.pkl".format(self.cache_dir)):
+            with self._lock(fn):
+                cached_data = self._read(fn)
+                if cached_data is None:
+                    continue
+                cached_data["payload"] = self._apply_free_agents_journal(
+                    cached_data["payload"], cached_data.get("built"),
+                    entries)
+                self._write(fn, cached_data)
+        with open(self.free_agents_journal_file(), "w"):
+            pass
+        self.journal = None
 
     def remove(self):
-        for fn in [self.prediction_builder_file(),
-                   self.league_lineup_file(), self.free_agents_cache_file()]:
-            if os.path.exists(fn):
-                os.remove(fn)
+        fns = [self.free_agents_journal_file()] + \
+            glob.glob("{}/free_agents*.pkl".format(self.cache_dir))
+        for fn in fns:
+            self.remove_file(fn)
 
 
 class LeagueCache(CacheBase):
-    def __init__(self, cfg):
+    """Cache of the files that are shared by all of the teams in a league
+
+    Each team that uses the cache registers itself in a teams file.  The
+    shared files are only removed once every team has let go of them.  Until
+    then a reset just marks the files that were built before it as stale, so
+    that the processes of other teams can keep reading them.
+    """
+    def __init__(self, cfg, stats=None):
         super(LeagueCache, self).__init__(
-            cfg, "{}/{}".format(cfg['Cache']['dir'], cfg['League']['id']))
+            cfg, "{}/{}".format(cfg['Cache']['dir'], cfg['League']['id']),
+            stats)
 
     def statics(self):
         return "{}/league_statics.pkl".format(self.cache_dir)
@@ -100,7 +1152,157 @@ class LeagueCache(CacheBase):
     def load_statics(self, loader):
         return self.run_loader(self.statics(), None, loader)
 
-    def remove(self):
-        for fn in [self.statics()]:
-            if os.path.exists(fn):
-                os.remove(fn)
+    def prediction_builder_file(self):
+        return "{}/pred_builder.pkl".format(self.cache_dir)
+
+    def load_prediction_builder(self, expiry, loader, grace=None,
+                                fingerprint=None, isolated_loader=None):
+        return self.run_loader(self.prediction_builder_file(), expiry, loader,
+                               grace, fingerprint, isolated_loader)
+
+    def league_lineup_file(self):
+        return "{}/lg_lineups.pkl".format(self.cache_dir)
+
+    def load_league_lineup(self, expiry, loader, grace=None,
+                           fingerprint=None, isolated_loader=None):
+        return self.run_loader(self.league_lineup_file(), expiry, loader,
+                               grace, fingerprint, isolated_loader)
+
+    def schedule_file(self):
+        return "{}/schedule.pkl".format(self.cache_dir)
+
+    def load_schedule(self, expiry, loader, grace=None, fingerprint=None,
+                      isolated_loader=None):
+        return self.run_loader(self.schedule_file(), expiry, loader, grace,
+                               fingerprint, isolated_loader)
+
+    def player_teams_file(self):
+        return "{}/player_teams.pkl".format(self.cache_dir)
+
+    def load_player_teams(self, expiry, loader, grace=None,
+                          isolated_loader=None):
+        return self.run_loader(self.player_teams_file(), expiry, loader,
+                               grace, isolated_loader=isolated_loader)
+
+    def opponent_summary_file(self, team_key):
+        return "{}/opp_sum.{}.pkl".format(self.cache_dir, team_key)
+
+    def load_opponent_summary(self, team_key, expiry, fingerprint, loader):
+        """Load the summary of a team's predicted stats
+
+        The summary is rebuilt when it expires or whenever the fingerprint
+        changes.  The summaries of other teams that have expired are removed.
+
+        :param team_key: Key of the team
+        :param expiry: How long a newly built summary is valid for
+        :type expiry: datetime.timedelta
+        :param fingerprint: Fingerprint of the team's roster and of the
+            inputs to the predictions
+        :param loader: Function that predicts and summarizes the team
+        """
+        self._prune_opponent_summaries(expiry)
+        return self.run_loader(self.opponent_summary_file(team_key), expiry,
+                               loader, fingerprint=fingerprint)
+
+    def _prune_opponent_summaries(self, expiry):
+        """Remove the opponent summaries that were built before expiry"""
+        cutoff = time.time() - expiry.total_seconds()
+        for fn in glob.glob("{}/opp_sum.*.pkl".format(self.cache_dir)):
+            try:
+                if os.path.getmtime(fn) < cutoff:
+                    self.logger.info("Pruning expired {} file".format(fn))
+                    self.remove_file(fn)
+            except FileNotFoundError:
+                pass
+
+    def teams_file(self):
+        return "{}/teams.json".format(self.cache_dir)
+
+    def teams(self):
+        """Return the teams that are using the league cache
+
+        :rtype: list(str)
+        """
+        try:
+            with open(self.teams_file()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def register_team(self, team_key):
+        """Record that a team is using the league cache
+
+        :param team_key: Key of the team
+        :type team_key: str
+        """
+        fn = self.teams_file()
+        with self._lock(fn):
+            teams = self.teams()
+            if team_key not in teams:
+                self._write_teams(teams + [team_key])
+
+    def remove(self, team_key):
+        """Release a team's reference to the league cache
+
+        The shared files are removed if no other team is using them.
+
+        :param team_key: Key of the team
+        :type team_key: str
+        :return: True if the shared files were removed
+        :rtype: bool
+        """
+        fn = self.teams_file()
+        with self._lock(fn):
+            teams = [t for t in self.teams() if t != team_key]
+            self._write_teams(teams)
+            if len(teams) > 0:
+                self.logger.info("Keeping the league cache.  It is still "
+                                 "used by {}".format(teams))
+                return False
+            shared_fns = [self.statics(), self.prediction_builder_file(),
+                          self.league_lineup_file(), self.schedule_file(),
+                          self.player_teams_file()] + \
+                glob.glob("{}/opp_sum.*.pkl".format(self.cache_dir))
+            for shared_fn in shared_fns:
+                self.remove_file(shared_fn)
+            return True
+
+    def reset_file(self):
+        return "{}/reset.json".format(self.cache_dir)
+
+    def reset(self, team_key):
+        """Reset the league cache for a team
+
+        The team's reference is released.  If other teams still use the
+        cache, the shared files are left in place but each is rebuilt the
+        next time it is used.
+
+        :param team_key: Key of the team
+        :type team_key: str
+        """
+        if self.remove(team_key):
+            return
+        fn = self.reset_file()
+        (fd, tmp_fn) = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp.")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"time": time.time()}, f)
+        os.replace(tmp_fn, fn)
+
+    def _reset_time(self):
+        """Return the time of the last reset, or 0 if there was none"""
+        try:
+            with open(self.reset_file()) as f:
+                return json.load(f)["time"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    def _is_servable(self, cached_data, fingerprint):
+        return super(LeagueCache, self)._is_servable(
+            cached_data, fingerprint) and \
+            cached_data.get("built", 0) >= self._reset_time()
+
+    def _write_teams(self, teams):
+        (fd, tmp_fn) = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(teams, f)
+        os.replace(tmp_fn, self.teams_file())